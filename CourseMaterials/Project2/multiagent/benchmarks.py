@@ -0,0 +1,493 @@
+# benchmarks.py
+# -------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Benchmarks for the Pacman game engine.
+
+To run a benchmark:
+
+  python benchmarks.py memory      peak memory of a depth-4 expectimax game
+  python benchmarks.py deadline    per-move cost of enforcing time limits
+  python benchmarks.py vector      random games with and without vectorPacman
+  python benchmarks.py primitives  the engine operations searches depend on
+  python benchmarks.py games       games per second for stock agents
+
+Each benchmark prints its measurements and returns them as a dict.  Since
+peak memory can only grow, run one memory benchmark per process.
+
+Timings are dicts of statistics over repeated runs, in microseconds per
+call (or seconds per game), after warmup runs that are not counted.  Every
+input is drawn from fixed seeds and layouts, so runs of different commits
+measure the same work.  To catch regressions, save the results of one
+commit and compare another against them:
+
+  python benchmarks.py -o before.json primitives games
+  python benchmarks.py --compare before.json primitives games
+  python benchmarks.py compare before.json after.json
+"""
+
+import gc
+import json
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import layout
+import multiAgents
+import pacman
+import pacmanAgents
+import textDisplay
+import util
+from ghostAgents import RandomGhost, DirectionalGhost
+
+RESULTS_VERSION = 1
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peakMemory():
+    """
+    Returns the peak resident set size of this process in kilobytes, or None
+    where it cannot be measured.
+    """
+    if resource == None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024  # reported in bytes rather than kilobytes
+    return peak
+
+
+def memoryBenchmark(layoutName='mediumClassic', depth=4, numMoves=100, seed=188):
+    """
+    Plays numMoves moves of an expectimax Pacman of the given depth against
+    random ghosts, keeping every state the search generates, as the
+    autograder does when it records the states a student's agent explored.
+
+    Peak memory is then dominated by the retained states, so the growth in
+    peak RSS over the number of states is the cost of a single state.
+    """
+    random.seed(seed)
+    lay = layout.getLayout(layoutName)
+    state = pacman.GameState()
+    state.initialize(lay, lay.getNumGhosts())
+    pacmanAgent = multiAgents.ExpectimaxAgent(depth=str(depth))
+    agents = [pacmanAgent] + [RandomGhost(i + 1) for i in range(lay.getNumGhosts())]
+
+    recorder = pacman.SetExplorationRecorder()
+    previous = pacman.GameState.setExplorationRecorder(recorder)
+    startMemory = peakMemory()
+    startTime = time.time()
+    moves = 0
+    try:
+        while moves < numMoves and not (state.isWin() or state.isLose()):
+            for agent in agents:
+                state = state.generateSuccessor(agent.index, agent.getAction(state))
+                if state.isWin() or state.isLose():
+                    break
+            moves += 1
+    finally:
+        pacman.GameState.setExplorationRecorder(previous)
+
+    result = {'benchmark': 'memory',
+              'layout': layoutName,
+              'depth': depth,
+              'moves': moves,
+              'states': recorder.count(),
+              'time': time.time() - startTime,
+              'peakKB': peakMemory()}
+    if startMemory != None:
+        result['bytesPerState'] = (result['peakKB'] - startMemory) * 1024.0 / max(result['states'], 1)
+    return result
+
+
+def _alarmCall(function, seconds):
+    """
+    Calls function the way TimeoutFunction used to: with a SIGALRM handler
+    installed and a whole-second alarm armed around the call.
+    """
+    def handleAlarm(signum, frame):
+        raise util.TimeoutFunctionException()
+    old = signal.signal(signal.SIGALRM, handleAlarm)
+    signal.alarm(seconds)
+    try:
+        return function()
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, old)
+
+
+def deadlineBenchmark(numCalls=20000, numProcessCalls=200):
+    """
+    Measures the cost in microseconds of calling a function that does nothing
+    under a deadline, per deadline mode, against calling it directly and the
+    alarm-based timeouts the game used before.  Process mode forks a worker
+    for every call, so it is timed over fewer calls.
+    """
+    def nothing():
+        return None
+
+    def timeCalls(call, n):
+        start = time.perf_counter()
+        for i in range(n):
+            call()
+        return (time.perf_counter() - start) * 1e6 / n
+
+    result = {'benchmark': 'deadline',
+              'directUs': timeCalls(nothing, numCalls)}
+    if hasattr(signal, 'SIGALRM'):
+        result['alarmUs'] = timeCalls(lambda: _alarmCall(nothing, 30), numCalls)
+    for mode in util.DEADLINE_MODES:
+        n = numProcessCalls if mode == util.DEADLINE_PROCESS else numCalls
+        result[mode + 'Us'] = timeCalls(
+            lambda: util.callWithDeadline(nothing, 30000, mode=mode), n)
+    return result
+
+
+def vectorBenchmark(layoutName='mediumClassic', numGames=256, seed=188):
+    """
+    Plays numGames games of random moves to the end, first one at a time
+    through GameState.generateSuccessor and then all together in a
+    vectorPacman.VectorGames, and compares the turns played per second.
+    """
+    import vectorPacman
+    lay = layout.getLayout(layoutName)
+    random.seed(seed)
+    startTime = time.time()
+    turns = 0
+    for i in range(numGames):
+        state = pacman.GameState()
+        state.initialize(lay, lay.getNumGhosts())
+        agentIndex = 0
+        while not (state.isWin() or state.isLose()):
+            state = state.generateSuccessor(
+                agentIndex, random.choice(state.getLegalActions(agentIndex)))
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+            turns += 1
+    engineTime = time.time() - startTime
+
+    games = vectorPacman.VectorGames(lay, numGames, seed=seed)
+    startTime = time.time()
+    vectorTurns = 0
+    agentIndex = 0
+    while not games.done.all():
+        vectorTurns += int((~games.done).sum())
+        games.step(agentIndex, games.randomActions(agentIndex))
+        agentIndex = (agentIndex + 1) % games.numAgents
+    vectorTime = time.time() - startTime
+
+    return {'benchmark': 'vector',
+            'layout': layoutName,
+            'games': numGames,
+            'engineTurnsPerSecond': turns / engineTime,
+            'vectorTurnsPerSecond': vectorTurns / vectorTime,
+            'speedup': (vectorTurns / vectorTime) / (turns / engineTime)}
+
+
+def timingStatistics(times):
+    """
+    Summarizes the times of repeated runs of a benchmark.
+    """
+    return {'median': statistics.median(times),
+            'min': min(times),
+            'mean': statistics.mean(times),
+            'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+            'repeats': len(times)}
+
+
+def timeCalls(function, makeArguments, repeat=7, warmup=1, minTime=0.02):
+    """
+    Times function called on each of the arguments from makeArguments().
+    Each run calls makeArguments again, untimed, as often as it takes to
+    spend minTime seconds in function, so no call sees the objects of an
+    earlier one (or their cached hashes).  Returns the statistics of the
+    microseconds per call over repeat runs, after warmup uncounted ones.
+
+    As in timeit, the garbage collector is off while timing, so that its
+    pauses land on whichever call happens to trigger them.
+    """
+    times = []
+    gcWasEnabled = gc.isenabled()
+    try:
+        for run in range(warmup + repeat):
+            elapsed, calls = 0.0, 0
+            while elapsed < minTime:
+                arguments = makeArguments()
+                gc.collect()
+                gc.disable()
+                start = time.perf_counter()
+                for argument in arguments:
+                    function(argument)
+                elapsed += time.perf_counter() - start
+                gc.enable()
+                calls += len(arguments)
+            if run >= warmup:
+                times.append(elapsed * 1e6 / calls)
+    finally:
+        if gcWasEnabled:
+            gc.enable()
+        else:
+            gc.disable()
+    return timingStatistics(times)
+
+
+def sampleStates(layoutName, numStates=200, seed=188):
+    """
+    Returns the states of a game of random moves on the layout, restarting
+    whenever it ends, until numStates have been seen.
+    """
+    random.seed(seed)
+    lay = layout.getLayout(layoutName)
+    states = []
+    while len(states) < numStates:
+        state = pacman.GameState()
+        state.initialize(lay, lay.getNumGhosts())
+        agentIndex = 0
+        while len(states) < numStates and not (state.isWin() or state.isLose()):
+            states.append(state)
+            state = state.generateSuccessor(
+                agentIndex, random.choice(state.getLegalActions(agentIndex)))
+            agentIndex = (agentIndex + 1) % state.getNumAgents()
+    return states
+
+
+def primitivesBenchmark(layoutName='mediumClassic', repeat=7, seed=188):
+    """
+    Times the game engine operations that searches call the most, on states
+    sampled from a game of random moves.
+    """
+    states = sampleStates(layoutName, seed=seed)
+    moves = [(state, agentIndex, action)
+             for state in states
+             for agentIndex in range(state.getNumAgents())
+             for action in state.getLegalActions(agentIndex)]
+    successors = lambda: [state.generateSuccessor(agentIndex, action)
+                          for state, agentIndex, action in moves]
+    food = [state.getFood() for state in states]
+    cells = [(grid, x, y) for grid in food[::10]
+             for x in range(grid.width) for y in range(grid.height)]
+
+    result = {'benchmark': 'primitives', 'layout': layoutName}
+    result['generateSuccessorUs'] = timeCalls(
+        lambda move: move[0].generateSuccessor(move[1], move[2]), lambda: moves, repeat)
+    result['getLegalActionsUs'] = timeCalls(
+        lambda move: move[0].getLegalActions(move[1]), lambda: moves, repeat)
+    result['hashUs'] = timeCalls(hash, successors, repeat)
+    result['eqUs'] = timeCalls(lambda pair: pair[0] == pair[1],
+                               lambda: [(state, state.deepCopy()) for state in states], repeat)
+    result['gridCopyUs'] = timeCalls(lambda grid: grid.copy(), lambda: food, repeat)
+    result['gridCountUs'] = timeCalls(lambda grid: grid.count(), lambda: food, repeat)
+    result['gridAsListUs'] = timeCalls(lambda grid: grid.asList(), lambda: food, repeat)
+    result['gridReadUs'] = timeCalls(lambda cell: cell[0][cell[1]][cell[2]], lambda: cells, repeat)
+    return result
+
+
+# The stock agents of the games benchmark
+GAME_PACMEN = {
+    'GreedyAgent': lambda: pacmanAgents.GreedyAgent(),
+    'ExpectimaxAgent': lambda: multiAgents.ExpectimaxAgent(depth='2'),
+}
+GAME_GHOSTS = {
+    'RandomGhost': RandomGhost,
+    'DirectionalGhost': DirectionalGhost,
+}
+
+
+def gamesBenchmark(layoutName='smallClassic', numGames=5, repeat=3, seed=188):
+    """
+    Plays numGames headless games for each pairing of the stock Pacman and
+    ghost agents, game i seeded with seed + i, repeat times over.  Reports
+    the statistics of the seconds per game over the repeats, the games and
+    moves per second, and the average score, which should not change
+    between commits that only change speed.
+    """
+    lay = layout.getLayout(layoutName)
+    rules = pacman.ClassicGameRules()
+    result = {'benchmark': 'games', 'layout': layoutName}
+    for pacmanName in sorted(GAME_PACMEN):
+        for ghostName in sorted(GAME_GHOSTS):
+            times = []
+            for run in range(repeat):
+                elapsed, moves, scores = 0.0, 0, []
+                for i in range(numGames):
+                    random.seed(seed + i)
+                    ghosts = [GAME_GHOSTS[ghostName](index + 1) for index in range(lay.getNumGhosts())]
+                    game = rules.newGame(lay, GAME_PACMEN[pacmanName](), ghosts,
+                                         textDisplay.NullGraphics(), quiet=True)
+                    start = time.perf_counter()
+                    game.run()
+                    elapsed += time.perf_counter() - start
+                    moves += len(game.moveHistory)
+                    scores.append(game.state.getScore())
+                times.append(elapsed / numGames)
+            name = pacmanName + '-' + ghostName
+            result[name + 'Seconds'] = timingStatistics(times)
+            result[name + 'GamesPerSecond'] = 1 / min(times)
+            result[name + 'MovesPerSecond'] = moves / (numGames * min(times))
+            result[name + 'AverageScore'] = sum(scores) / float(numGames)
+    return result
+
+
+def currentCommit():
+    """
+    Returns the git commit of the working tree, or None outside a checkout.
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def saveResults(results, path):
+    """
+    Writes the results of a run to path as JSON, with where they came from.
+    """
+    f = open(path, 'w')
+    try:
+        json.dump({'version': RESULTS_VERSION,
+                   'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'commit': currentCommit(),
+                   'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'results': results}, f, indent=2, sort_keys=True)
+    finally:
+        f.close()
+
+
+def loadResults(path):
+    f = open(path)
+    try:
+        saved = json.load(f)
+    finally:
+        f.close()
+    if saved.get('version') != RESULTS_VERSION:
+        raise Exception('%s holds results of an unsupported version' % path)
+    return saved['results']
+
+
+def compareResults(before, after, tolerance=0.1):
+    """
+    Prints the change in every timing the two lists of results share, and
+    returns the names of those that got slower by more than tolerance (a
+    fraction).  Timings are compared by their fastest run, which is the
+    least disturbed by whatever else the machine was doing.
+    """
+    regressions = []
+    old = dict([(result['benchmark'], result) for result in before])
+    for result in after:
+        name = result['benchmark']
+        if name not in old:
+            continue
+        for key in sorted(result):
+            value = result[key]
+            if not (isinstance(value, dict) and 'min' in value):
+                continue
+            oldValue = old[name].get(key)
+            if not (isinstance(oldValue, dict) and oldValue.get('min')):
+                continue
+            ratio = value['min'] / oldValue['min']
+            verdict = ''
+            if ratio > 1 + tolerance:
+                verdict = 'SLOWER'
+                regressions.append(name + '.' + key)
+            elif ratio < 1 - tolerance:
+                verdict = 'faster'
+            print('%-45s %12.4f -> %12.4f  %6.2fx  %s' % (
+                name + '.' + key, oldValue['min'], value['min'], ratio, verdict))
+    return regressions
+
+
+def printResult(result):
+    def show(value):
+        if isinstance(value, dict) and 'median' in value:
+            return '%.4f (min %.4f, sd %.4f)' % (value['median'], value['min'], value['stdev'])
+        if type(value) == float:
+            return '%.2f' % value
+        return value
+    print(', '.join(['%s: %s' % (key, show(value)) for key, value in result.items()]))
+
+
+# Runs each benchmark with the command-line options
+BENCHMARKS = {
+    'memory': lambda options: memoryBenchmark(options.layout, options.depth, options.numMoves),
+    'deadline': lambda options: deadlineBenchmark(),
+    'vector': lambda options: vectorBenchmark(options.layout, options.numGames),
+    'primitives': lambda options: primitivesBenchmark(options.layout, options.repeat),
+    'games': lambda options: gamesBenchmark(options.gameLayout, options.games),
+}
+
+
+def readCommand(argv):
+    from optparse import OptionParser
+    usageStr = """
+    USAGE:      python benchmarks.py <options> <benchmark> ...
+                python benchmarks.py compare <before.json> <after.json>
+    BENCHMARKS: %s
+    """ % ', '.join(sorted(BENCHMARKS))
+    parser = OptionParser(usageStr)
+    parser.add_option('-l', '--layout', dest='layout',
+                      help='the layout to play on', default='mediumClassic')
+    parser.add_option('-d', '--depth', dest='depth', type='int',
+                      help='the search depth of the memory benchmark', default=4)
+    parser.add_option('-m', '--moves', dest='numMoves', type='int',
+                      help='the number of moves to play', default=100)
+    parser.add_option('-n', '--numGames', dest='numGames', type='int',
+                      help='the number of games of the vector benchmark', default=256)
+    parser.add_option('-g', '--games', dest='games', type='int',
+                      help='the number of games per pairing of the games benchmark', default=5)
+    parser.add_option('--gameLayout', dest='gameLayout',
+                      help='the layout of the games benchmark', default='smallClassic')
+    parser.add_option('-r', '--repeat', dest='repeat', type='int',
+                      help='the number of timed runs of each primitive', default=7)
+    parser.add_option('-o', '--output', dest='output',
+                      help='save the results to this JSON file', default=None)
+    parser.add_option('-c', '--compare', dest='compare',
+                      help='compare the results with those saved in this JSON file', default=None)
+    parser.add_option('-t', '--tolerance', dest='tolerance', type='float',
+                      help='the fraction by which a timing may grow before it is a regression', default=0.1)
+    options, names = parser.parse_args(argv)
+    if names[:1] == ['compare']:
+        if len(names) != 3:
+            parser.error('compare takes two result files')
+        return options, names
+    for name in names:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark: ' + name)
+    return options, names or sorted(BENCHMARKS)
+
+
+if __name__ == '__main__':
+    options, names = readCommand(sys.argv[1:])
+    if names[0] == 'compare':
+        before, after = loadResults(names[1]), loadResults(names[2])
+    else:
+        after = []
+        for name in names:
+            after.append(BENCHMARKS[name](options))
+            printResult(after[-1])
+        if options.output != None:
+            saveResults(after, options.output)
+        before = loadResults(options.compare) if options.compare != None else None
+    if before != None:
+        regressions = compareResults(before, after, options.tolerance)
+        if regressions:
+            print('%d timing(s) regressed: %s' % (len(regressions), ', '.join(regressions)))
+            sys.exit(1)
@@ -28,7 +28,7 @@ from pprint import PrettyPrinter
 pp = PrettyPrinter()
 
 from game import Agent
-from pacman import GameState
+from pacman import GameState, SetExplorationRecorder
 from ghostAgents import RandomGhost, DirectionalGhost
 import random
 import math
@@ -158,6 +158,20 @@ def run(lay, layName, pac, ghosts, disp, nGames=1, name='games'):
     return stats
 
 
+def exploreWith(recorder, func, state):
+    """
+    Calls func(state) with recorder tracking the states it generates.  The
+    recorder is reset first and the previous recorder is restored afterwards,
+    so only states explored by this call are counted.
+    """
+    recorder.reset()
+    previousRecorder = GameState.setExplorationRecorder(recorder)
+    try:
+        return func(state)
+    finally:
+        GameState.setExplorationRecorder(previousRecorder)
+
+
 class GradingAgent(Agent):
     def __init__(self, seed, studentAgent, optimalActions, altDepthActions, partialPlyBugActions):
         # save student agent and actions of refernce agents
@@ -178,6 +192,8 @@ class GradingAgent(Agent):
         # keep track of elapsed moves
         self.stepCount = 0
         self.seed = seed
+        # counts the distinct states the student agent generates per move
+        self.explorationRecorder = SetExplorationRecorder()
 
     def registerInitialState(self, state):
         if 'registerInitialState' in dir(self.studentAgent):
@@ -185,9 +201,8 @@ class GradingAgent(Agent):
         random.seed(self.seed)
 
     def getAction(self, state):
-        GameState.getAndResetExplored()
-        studentAction = (self.studentAgent.getAction(state),
-                         len(GameState.getAndResetExplored()))
+        studentAction = (exploreWith(self.explorationRecorder, self.studentAgent.getAction, state),
+                         self.explorationRecorder.count())
         optimalActions = self.optimalActions[self.stepCount]
         altDepthActions = self.altDepthActions[self.stepCount]
         partialPlyBugActions = self.partialPlyBugActions[self.stepCount]
@@ -261,6 +276,7 @@ class PolyAgent(Agent):
         self.partialPlyBugLists = []
         self.seed = seed
         self.stepCount = 0
+        self.explorationRecorder = SetExplorationRecorder()
 
     def select(self, list, indices):
         """
@@ -295,11 +311,10 @@ class PolyAgent(Agent):
 
     def getAction(self, state):
         # survey agents
-        GameState.getAndResetExplored()
         optimalActionLists = []
         for agent in self.solutionAgents:
-            optimalActionLists.append((agent.getBestPacmanActions(
-                state)[0], len(GameState.getAndResetExplored())))
+            optimalActionLists.append((exploreWith(self.explorationRecorder, agent.getBestPacmanActions,
+                                                   state)[0], self.explorationRecorder.count()))
         alternativeDepthLists = [agent.getBestPacmanActions(
             state)[0] for agent in self.alternativeDepthAgents]
         partialPlyBugLists = [agent.getBestPacmanActions(
@@ -43,6 +43,7 @@ from game import GameStateData
 from game import Game
 from game import Directions
 from game import Actions
+from game import Configuration
 from util import nearestPoint
 from util import manhattanDistance
 import util
@@ -52,6 +53,7 @@ import types
 import time
 import random
 import os
+import math
 
 ###################################################
 # YOUR INTERFACE TO THE PACMAN WORLD: A GameState #
@@ -72,17 +74,36 @@ class GameState:
 
     Note that in classic Pacman, Pacman is always agent 0.
     """
+    __slots__ = ('data',)
 
     ####################################################
     # Accessor methods: use these to access state data #
     ####################################################
 
-    # static variable keeps track of which states have had getLegalActions called
-    explored = set()
+    # static variable holding the recorder (see ExplorationRecorder) that
+    # observes generateSuccessor calls; None disables tracking altogether
+    explorationRecorder = None
+
+    def setExplorationRecorder(recorder):
+        """
+        Installs recorder to observe every call to generateSuccessor and
+        returns the previously installed one.  Passing None turns tracking off.
+        """
+        previous = GameState.explorationRecorder
+        GameState.explorationRecorder = recorder
+        return previous
+    setExplorationRecorder = staticmethod(setExplorationRecorder)
 
     def getAndResetExplored():
-        tmp = GameState.explored.copy()
-        GameState.explored = set()
+        """
+        Returns the states recorded since the last reset.  Only the 'set'
+        recording mode retains states; the other modes return an empty set.
+        """
+        recorder = GameState.explorationRecorder
+        if recorder is None:
+            return set()
+        tmp = recorder.getExplored()
+        recorder.reset()
         return tmp
     getAndResetExplored = staticmethod(getAndResetExplored)
 
@@ -121,7 +142,8 @@ class GameState:
         if agentIndex == 0:
             state.data.scoreChange += -TIME_PENALTY  # Penalty for waiting around
         else:
-            GhostRules.decrementTimer(state.data.agentStates[agentIndex])
+            GhostRules.decrementTimer(
+                state.data.getMutableAgentState(agentIndex))
 
         # Resolve multi-agent effects
         GhostRules.checkDeath(state, agentIndex)
@@ -129,8 +151,8 @@ class GameState:
         # Book keeping
         state.data._agentMoved = agentIndex
         state.data.score += state.data.scoreChange
-        GameState.explored.add(self)
-        GameState.explored.add(state)
+        if GameState.explorationRecorder is not None:
+            GameState.explorationRecorder.record(self, state)
         return state
 
     def getLegalPacmanActions(self):
@@ -155,12 +177,18 @@ class GameState:
         return self.data.agentStates[0].getPosition()
 
     def getGhostStates(self):
-        return self.data.agentStates[1:]
+        """
+        Returns copies of the ghosts' AgentStates, which the game state
+        shares with its successors.  Each call allocates a copy per ghost,
+        so code that runs for every state, such as an evaluation function,
+        should prefer getGhostPositions and getGhostScaredTimes.
+        """
+        return [s.copy() for s in self.data.agentStates[1:]]
 
     def getGhostState(self, agentIndex):
         if agentIndex == 0 or agentIndex >= self.getNumAgents():
             raise Exception("Invalid index passed to getGhostState")
-        return self.data.agentStates[agentIndex]
+        return self.data.agentStates[agentIndex].copy()
 
     def getGhostPosition(self, agentIndex):
         if agentIndex == 0:
@@ -168,7 +196,13 @@ class GameState:
         return self.data.agentStates[agentIndex].getPosition()
 
     def getGhostPositions(self):
-        return [s.getPosition() for s in self.getGhostStates()]
+        return [s.getPosition() for s in self.data.agentStates[1:]]
+
+    def getGhostScaredTimes(self):
+        """
+        Returns the scared timer of each ghost, without copying their states.
+        """
+        return [s.scaredTimer for s in self.data.agentStates[1:]]
 
     def getNumAgents(self):
         return len(self.data.agentStates)
@@ -240,6 +274,15 @@ class GameState:
         state.data = self.data.deepCopy()
         return state
 
+    def snapshot(self):
+        """
+        Returns a read-only copy of this state, cheaper than deepCopy since
+        it shares the food, capsules, agent states and layout.
+        """
+        state = GameState(self)
+        state.data = self.data.snapshot()
+        return state
+
     def __eq__(self, other):
         """
         Allows two states to be compared.
@@ -274,20 +317,133 @@ COLLISION_TOLERANCE = 0.7  # How close ghosts must be to Pacman to kill
 TIME_PENALTY = 1  # Number of points lost each round
 
 
+class ExplorationRecorder:
+    """
+    Observes the states produced by GameState.generateSuccessor.  Subclasses
+    decide how much they remember; install one with
+    GameState.setExplorationRecorder.
+    """
+
+    def record(self, parent, child):
+        pass
+
+    def count(self):
+        """
+        Returns the number of states recorded since the last reset.
+        """
+        return 0
+
+    def getExplored(self):
+        return set()
+
+    def reset(self):
+        pass
+
+
+class CountingExplorationRecorder(ExplorationRecorder):
+    """
+    Counts successor generations without hashing or retaining any state.
+    """
+
+    def __init__(self):
+        self.generated = 0
+
+    def record(self, parent, child):
+        self.generated += 1
+
+    def count(self):
+        return self.generated
+
+    def reset(self):
+        self.generated = 0
+
+
+class BloomExplorationRecorder(ExplorationRecorder):
+    """
+    Estimates the number of distinct states seen with a fixed-size bloom
+    filter, so memory stays bounded no matter how many states are generated.
+    """
+
+    def __init__(self, numBits=1 << 20, numHashes=3):
+        self.numBits = numBits
+        self.numHashes = numHashes
+        self.reset()
+
+    def _add(self, state):
+        h = hash(state)
+        isNew = False
+        for i in range(self.numHashes):
+            bit = hash((h, i)) % self.numBits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                self.bitsSet += 1
+                isNew = True
+        if isNew:
+            self.inserted += 1
+
+    def record(self, parent, child):
+        self._add(parent)
+        self._add(child)
+
+    def count(self):
+        """
+        Returns the estimated number of distinct states, derived from the
+        fraction of bits set (Swamidass & Baldi).
+        """
+        if self.bitsSet >= self.numBits:
+            return self.inserted
+        estimate = -self.numBits / float(self.numHashes) * \
+            math.log(1 - self.bitsSet / float(self.numBits))
+        return int(round(estimate))
+
+    def reset(self):
+        self.bits = bytearray((self.numBits + 7) // 8)
+        self.bitsSet = 0
+        self.inserted = 0
+
+
+class SetExplorationRecorder(ExplorationRecorder):
+    """
+    Keeps every distinct state generated.  This is exact but holds each
+    state alive until reset, so only use it for short, bounded windows such
+    as a single autograded move.
+    """
+
+    def __init__(self):
+        self.explored = set()
+
+    def record(self, parent, child):
+        self.explored.add(parent)
+        self.explored.add(child)
+
+    def count(self):
+        return len(self.explored)
+
+    def getExplored(self):
+        return self.explored.copy()
+
+    def reset(self):
+        self.explored = set()
+
+
 class ClassicGameRules:
     """
     These game rules manage the control flow of a game, deciding when
     and how the game starts and ends.
     """
 
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, deadlineMode=None, strictObservations=False):
         self.timeout = timeout
+        self.deadlineMode = deadlineMode
+        self.strictObservations = strictObservations
 
     def newGame(self, layout, pacmanAgent, ghostAgents, display, quiet=False, catchExceptions=False):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = GameState()
         initState.initialize(layout, len(ghostAgents))
-        game = Game(agents, display, self, catchExceptions=catchExceptions)
+        game = Game(agents, display, self, catchExceptions=catchExceptions,
+                    deadlineMode=self.deadlineMode, strictObservations=self.strictObservations)
         game.state = initState
         self.initialState = initState.deepCopy()
         self.quiet = quiet
@@ -348,7 +504,11 @@ class PacmanRules:
         """
         Returns a list of possible actions.
         """
-        return Actions.getPossibleActions(state.getPacmanState().configuration, state.data.layout.walls)
+        config = state.getPacmanState().configuration
+        actions = state.data.layout.legalActions.get(config.pos)
+        if actions is not None:
+            return list(actions)
+        return Actions.getPossibleActions(config, state.data.layout.walls)
     getLegalActions = staticmethod(getLegalActions)
 
     def applyAction(state, action):
@@ -359,7 +519,7 @@ class PacmanRules:
         if action not in legal:
             raise Exception("Illegal action " + str(action))
 
-        pacmanState = state.data.agentStates[0]
+        pacmanState = state.data.getMutableAgentState(0)
 
         # Update Configuration
         vector = Actions.directionToVector(action, PacmanRules.PACMAN_SPEED)
@@ -381,6 +541,7 @@ class PacmanRules:
             state.data.scoreChange += 10
             state.data.food = state.data.food.copy()
             state.data.food[x][y] = False
+            state.data.toggleFoodHash(position)
             state.data._foodEaten = position
             # TODO: cache numFood?
             numFood = state.getNumFood()
@@ -389,11 +550,14 @@ class PacmanRules:
                 state.data._win = True
         # Eat capsule
         if(position in state.getCapsules()):
+            state.data.capsules = state.data.capsules[:]
             state.data.capsules.remove(position)
+            state.data.toggleCapsuleHash(position)
             state.data._capsuleEaten = position
             # Reset all ghosts' scared timers
             for index in range(1, len(state.data.agentStates)):
-                state.data.agentStates[index].scaredTimer = SCARED_TIME
+                state.data.getMutableAgentState(
+                    index).scaredTimer = SCARED_TIME
     consume = staticmethod(consume)
 
 
@@ -408,7 +572,11 @@ class GhostRules:
         Ghosts cannot stop, and cannot turn around unless they
         reach a dead end, but can turn 90 degrees at intersections.
         """
-        conf = state.getGhostState(ghostIndex).configuration
+        conf = state.data.agentStates[ghostIndex].configuration
+        actions = state.data.layout.ghostActions.get(conf.pos)
+        if actions is not None:
+            return list(actions[conf.direction])
+        # Scared ghosts move at half speed, so may be between cells
         possibleActions = Actions.getPossibleActions(
             conf, state.data.layout.walls)
         reverse = Actions.reverseDirection(conf.direction)
@@ -425,7 +593,7 @@ class GhostRules:
         if action not in legal:
             raise Exception("Illegal ghost action " + str(action))
 
-        ghostState = state.data.agentStates[ghostIndex]
+        ghostState = state.data.getMutableAgentState(ghostIndex)
         speed = GhostRules.GHOST_SPEED
         if ghostState.scaredTimer > 0:
             speed /= 2.0
@@ -437,8 +605,9 @@ class GhostRules:
     def decrementTimer(ghostState):
         timer = ghostState.scaredTimer
         if timer == 1:
-            ghostState.configuration.pos = nearestPoint(
-                ghostState.configuration.pos)
+            configuration = ghostState.configuration
+            ghostState.configuration = Configuration(
+                nearestPoint(configuration.pos), configuration.direction)
         ghostState.scaredTimer = max(0, timer - 1)
     decrementTimer = staticmethod(decrementTimer)
 
@@ -459,6 +628,7 @@ class GhostRules:
 
     def collide(state, ghostState, agentIndex):
         if ghostState.scaredTimer > 0:
+            ghostState = state.data.getMutableAgentState(agentIndex)
             state.data.scoreChange += 200
             GhostRules.placeGhost(state, ghostState)
             ghostState.scaredTimer = 0
@@ -543,7 +713,9 @@ def readCommand(argv):
     parser.add_option('-r', '--recordActions', action='store_true', dest='record',
                       help='Writes game histories to a file (named by the time they were played)', default=False)
     parser.add_option('--replay', dest='gameToReplay',
-                      help='A recorded game file (pickle) to replay', default=None)
+                      help='A recorded game file to replay', default=None)
+    parser.add_option('--replayFrom', dest='replayFrom', type='int',
+                      help=default('The turn to start showing a replayed game from'), default=0)
     parser.add_option('-a', '--agentArgs', dest='agentArgs',
                       help='Comma separated values sent to agent. e.g. "opt1=val1,opt2,opt3=val3"')
     parser.add_option('-x', '--numTraining', dest='numTraining', type='int',
@@ -552,8 +724,23 @@ def readCommand(argv):
                       help=default('Time to delay between frames; <0 means keyboard'), default=0.1)
     parser.add_option('-c', '--catchExceptions', action='store_true', dest='catchExceptions',
                       help='Turns on exception handling and timeouts during games', default=False)
-    parser.add_option('--timeout', dest='timeout', type='int',
+    parser.add_option('--timeout', dest='timeout', type='float',
                       help=default('Maximum length of time an agent can spend computing in a single game'), default=30)
+    parser.add_option('--deadlineMode', dest='deadlineMode', type='choice', choices=util.DEADLINE_MODES,
+                      help='How timeouts are enforced with -c: %s (default: signal where available)' %
+                      ', '.join(util.DEADLINE_MODES), default=None)
+    parser.add_option('--strictObservations', action='store_true', dest='strictObservations',
+                      help='Give agents deep copies of the game state rather than read-only snapshots', default=False)
+    parser.add_option('-w', '--workers', dest='numWorkers', type='int',
+                      help=default('Number of processes to play headless games in parallel (0 plays them in order here)'), default=0)
+    parser.add_option('--profile', action='store_true', dest='profile',
+                      help='Time each phase of the games per agent and print a summary', default=False)
+    parser.add_option('--profileCounters', action='store_true', dest='profileCounters',
+                      help='With --profile, also count the states generated and memory allocated in each phase', default=False)
+    parser.add_option('--profileTrace', dest='profileTrace',
+                      help='With --profile, write every phase of every move to this file as a Chrome trace', default=None)
+    parser.add_option('--layoutIndex', action='store_true', dest='layoutIndex',
+                      help='Load layouts from the index that python layout.py builds in layouts/', default=False)
 
     options, otherjunk = parser.parse_args(argv)
     if len(otherjunk) != 0:
@@ -565,6 +752,8 @@ def readCommand(argv):
         random.seed('cs188')
 
     # Choose a layout
+    if options.layoutIndex:
+        layout.loadLayoutIndex('layouts')
     args['layout'] = layout.getLayout(options.layout)
     if args['layout'] == None:
         raise Exception("The layout " + options.layout + " cannot be found")
@@ -606,18 +795,34 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['timeout'] = options.timeout
+    args['deadlineMode'] = options.deadlineMode
+    args['strictObservations'] = options.strictObservations
+    if options.numWorkers > 0:
+        # Only the -w path of __main__ reads this; see runGamesParallel
+        args['numWorkers'] = options.numWorkers
+    if options.profile or options.profileTrace != None:
+        import gameProfiler
+        args['profiler'] = gameProfiler.GameProfiler(options.profileCounters, options.profileCounters,
+                                                     options.profileTrace != None)
+        args['profileTrace'] = options.profileTrace
 
     # Special case: recorded games don't use the runGames method or args structure
     if options.gameToReplay != None:
         print('Replaying recorded game %s.' % options.gameToReplay)
-        import pickle
-        f = open(options.gameToReplay)
-        try:
-            recorded = pickle.load(f)
-        finally:
-            f.close()
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+        import replay
+        if replay.isReplayFile(options.gameToReplay):
+            recorded = replay.readReplay(options.gameToReplay)
+            replayGame(recorded.layout, recorded.getMoveHistory(), args['display'],
+                       options.replayFrom, numGhosts=recorded.numAgents - 1)
+        else:
+            # A game pickled by an earlier version
+            import pickle
+            f = open(options.gameToReplay, 'rb')
+            try:
+                recorded = pickle.load(f)
+            finally:
+                f.close()
+            replayGame(recorded['layout'], recorded['actions'], args['display'], options.replayFrom)
         sys.exit(0)
 
     return args
@@ -651,32 +856,62 @@ def loadAgent(pacman, nographics):
                     ' is not specified in any *Agents.py.')
 
 
-def replayGame(layout, actions, display):
+def replayGame(layout, actions, display=None, startTurn=0, endTurn=None, numGhosts=None):
+    """
+    Replays the (agentIndex, action) moves of a recorded game and returns
+    the state after the last one.  The first startTurn moves are played
+    without updating the display, and the replay stops after endTurn moves
+    if given.  With no display the game is replayed headless.
+    """
     import pacmanAgents
     import ghostAgents
+    import textDisplay
+    if numGhosts == None:
+        numGhosts = layout.getNumGhosts()
+    if endTurn == None:
+        endTurn = len(actions)
     rules = ClassicGameRules()
     agents = [pacmanAgents.GreedyAgent()] + [ghostAgents.RandomGhost(i+1)
-                                             for i in range(layout.getNumGhosts())]
-    game = rules.newGame(layout, agents[0], agents[1:], display)
+                                             for i in range(numGhosts)]
+    game = rules.newGame(layout, agents[0], agents[1:], display or textDisplay.NullGraphics(),
+                         quiet=display == None)
     state = game.state
-    display.initialize(state.data)
+    for action in actions[:startTurn]:
+        state = state.generateSuccessor(*action)
+    game.state = state
+    if display != None:
+        display.initialize(state.data)
 
-    for action in actions:
-            # Execute the action
+    for action in actions[startTurn:endTurn]:
+        # Execute the action
         state = state.generateSuccessor(*action)
+        game.state = state
         # Change the display
-        display.update(state.data)
+        if display != None:
+            display.update(state.data)
         # Allow for game specific conditions (winning, losing, etc.)
         rules.process(state, game)
 
-    display.finish()
+    if display != None:
+        display.finish()
+    return state
+
 
+def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30,
+             deadlineMode=None, strictObservations=False, profiler=None, profileTrace=None):
+    """
+    Plays numGames games and returns the Game objects of the non-training
+    ones.  To play headless games on several processes, see
+    runGamesParallel.
 
-def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, catchExceptions=False, timeout=30):
+    Given a gameProfiler.GameProfiler, every game is profiled with it and
+    its summary printed at the end; with profileTrace, its trace is written
+    to that file.
+    """
     import __main__
     __main__.__dict__['_display'] = display
 
-    rules = ClassicGameRules(timeout)
+    rules = ClassicGameRules(timeout, deadlineMode, strictObservations)
     games = []
 
     for i in range(numGames):
@@ -691,34 +926,173 @@ def runGames(layout, pacman, ghosts, display, numGames, record, numTraining=0, c
             rules.quiet = False
         game = rules.newGame(layout, pacman, ghosts,
                              gameDisplay, beQuiet, catchExceptions)
-        game.run()
+        if record:
+            game.replayWriter = newReplayWriter(game, i)
+        game.profiler = profiler
+        try:
+            game.run()
+        finally:
+            if record:
+                game.replayWriter.close(game.state)
         if not beQuiet:
             games.append(game)
 
-        if record:
-            import time
-            import pickle
-            fname = ('recorded-game-%d' % (i + 1)) + \
-                '-'.join([str(t) for t in time.localtime()[1:6]])
-            f = file(fname, 'w')
-            components = {'layout': layout, 'actions': game.moveHistory}
-            pickle.dump(components, f)
-            f.close()
-
     if (numGames-numTraining) > 0:
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        print('Average Score:', sum(scores) / float(len(scores)))
-        print('Scores:       ', ', '.join([str(score) for score in scores]))
-        print('Win Rate:      %d/%d (%.2f)' %
-              (wins.count(True), len(wins), winRate))
-        print('Record:       ', ', '.join(
-            [['Loss', 'Win'][int(w)] for w in wins]))
+        printSummary([game.state.getScore() for game in games],
+                     [game.state.isWin() for game in games])
+    printProfile(profiler, profileTrace)
 
     return games
 
 
+def newReplayWriter(game, index):
+    """
+    Returns a replay.ReplayWriter recording game, the index-th of a run,
+    to a file named after it and the current time.
+    """
+    import replay
+    fname = ('recorded-game-%d' % (index + 1)) + \
+        '-'.join([str(t) for t in time.localtime()[1:6]])
+    return replay.ReplayWriter(fname, game.state.data.layout, game.state.getNumAgents(), game.startingIndex)
+
+
+def printProfile(profiler, profileTrace=None):
+    """
+    Prints the summary of profiler, if any, and writes its trace to the
+    file profileTrace if given.
+    """
+    if profiler == None:
+        return
+    profiler.printSummary()
+    if profileTrace != None:
+        profiler.writeTrace(profileTrace)
+        print('Wrote the profile trace to %s' % profileTrace)
+
+
+def printSummary(scores, wins):
+    winRate = wins.count(True) / float(len(wins))
+    print('Average Score:', sum(scores) / float(len(scores)))
+    print('Scores:       ', ', '.join([str(score) for score in scores]))
+    print('Win Rate:      %d/%d (%.2f)' %
+          (wins.count(True), len(wins), winRate))
+    print('Record:       ', ', '.join(
+        [['Loss', 'Win'][int(w)] for w in wins]))
+
+
+# The layout, agents and settings shared by the games of runGamesParallel.
+# Worker processes are forked after this is set, so they inherit it rather
+# than unpickling agents (which may hold lambdas or open resources).
+_batchGames = None
+
+
+def _playBatchGame(task):
+    """
+    Plays one headless game of runGamesParallel and returns its result.
+    """
+    import textDisplay
+    index, seed = task
+    layout, pacman, ghosts, catchExceptions, timeout, deadlineMode, strictObservations, record, profiler = _batchGames
+    random.seed(seed)
+    rules = ClassicGameRules(timeout, deadlineMode, strictObservations)
+    startTime = time.time()
+    game = rules.newGame(layout, pacman, ghosts, textDisplay.NullGraphics(),
+                         True, catchExceptions)
+    if record:
+        game.replayWriter = newReplayWriter(game, index)
+    if profiler != None:
+        game.profiler = profiler.spawn()
+    try:
+        game.run()
+    finally:
+        if record:
+            game.replayWriter.close(game.state)
+    return {'game': index,
+            'seed': seed,
+            'score': game.state.getScore(),
+            'win': game.state.isWin(),
+            'moves': len(game.moveHistory),
+            'agentTimes': list(game.totalAgentTimes),
+            'time': time.time() - startTime,
+            'crashed': game.agentCrashed,
+            'timedOut': game.agentTimeout,
+            'profile': game.profiler}
+
+
+def runGamesParallel(layout, pacman, ghosts, numGames, numWorkers=None, numTraining=0, catchExceptions=False,
+                     timeout=30, seed=None, quiet=False, record=False, deadlineMode=None,
+                     strictObservations=False, profiler=None, profileTrace=None):
+    """
+    Plays numGames headless games on a pool of numWorkers processes (one per
+    CPU by default) and prints the same summary as runGames.  This is what
+    pacman.py runs when given -w.
+
+    The first numTraining games are played in this process, as in runGames,
+    so learning agents are trained once; the workers then play the remaining
+    games with copies of the trained agents.  Game i is seeded with seed + i,
+    making every game reproducible regardless of which worker plays it; seed
+    defaults to a draw from the current random state.  Results are printed as
+    games finish unless quiet, and returned in game order as dicts with the
+    keys game, seed, score, win, moves, agentTimes, time, crashed and timedOut.
+    With record, each worker writes replay files for the games it plays.
+    Given a profiler, each game is profiled and the results merged into it.
+
+    Workers are forked so they inherit the agents; where fork is unavailable
+    the games are played in this process instead.
+    """
+    global _batchGames
+    import multiprocessing
+    import textDisplay
+    if numTraining > 0:
+        runGames(layout, pacman, ghosts, textDisplay.NullGraphics(), numTraining, record,
+                 numTraining=numTraining, catchExceptions=catchExceptions, timeout=timeout,
+                 deadlineMode=deadlineMode, strictObservations=strictObservations, profiler=profiler)
+    if seed == None:
+        seed = random.randrange(2 ** 31)
+    tasks = [(i, seed + i) for i in range(numTraining, numGames)]
+
+    _batchGames = (layout, pacman, ghosts, catchExceptions, timeout, deadlineMode, strictObservations, record,
+                   profiler)
+    results = []
+    try:
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            context = None
+        if context == None:
+            finished = map(_playBatchGame, tasks)
+            pool = None
+        else:
+            pool = context.Pool(numWorkers)
+            finished = pool.imap_unordered(_playBatchGame, tasks)
+        try:
+            for result in finished:
+                profile = result.pop('profile')
+                if profile != None:
+                    profiler.merge(profile)
+                results.append(result)
+                if not quiet:
+                    print('Game %d: %s, score %d, %d moves in %.2f seconds' % (
+                        result['game'] + 1, ['Loss', 'Win'][int(result['win'])],
+                        result['score'], result['moves'], result['time']))
+        except BaseException:
+            if pool != None:
+                pool.terminate()
+            raise
+        finally:
+            if pool != None:
+                pool.close()
+                pool.join()
+    finally:
+        _batchGames = None
+
+    results.sort(key=lambda result: result['game'])
+    if len(results) > 0:
+        printSummary([result['score'] for result in results],
+                     [result['win'] for result in results])
+    printProfile(profiler, profileTrace)
+    return results
+
+
 if __name__ == '__main__':
     """
     The main function called when pacman.py is run
@@ -731,7 +1105,12 @@ if __name__ == '__main__':
     > python pacman.py --help
     """
     args = readCommand(sys.argv[1:])  # Get game components based on input
-    runGames(**args)
+    if 'numWorkers' in args:
+        # The workers' games are headless and return results, not Games
+        del args['display']
+        runGamesParallel(**args)
+    else:
+        runGames(**args)
 
     # import cProfile
     # cProfile.run("runGames( **args )")
@@ -0,0 +1,277 @@
+# replay.py
+# ---------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+A compact file format for recorded Pacman games.
+
+A replay file holds the layout once, then the moves of the game as 3-bit
+action codes, one per agent turn; the agent of each turn follows from the
+turn order.  All numbers are little-endian:
+
+  header      MAGIC, version (1 byte), number of agents (1 byte), starting
+              agent (1 byte), checkpoint interval in turns (4 bytes), SHA-1
+              of the layout text (20 bytes), length of the compressed layout
+              text (4 bytes) and the zlib-compressed layout text
+  records     each a tag byte followed by its contents:
+                'A'  number of turns (2 bytes), then the action codes packed
+                     eight to three bytes
+                'S'  score checkpoint: turns played (4 bytes) and the score
+                     after them (8-byte float)
+                'E'  end of game: turns played (4 bytes), final score
+                     (8-byte float) and outcome (1 byte: 1 win, 2 loss)
+
+ReplayWriter streams a game to a file as it is played, and readReplay loads
+one back as a Replay, which can rebuild the state after any turn.
+"""
+
+import hashlib
+import struct
+import zlib
+from game import Directions
+import layout
+
+MAGIC = b'PACREPLY'
+VERSION = 1
+
+ACTION_CODES = {Directions.NORTH: 0, Directions.SOUTH: 1, Directions.EAST: 2,
+                Directions.WEST: 3, Directions.STOP: 4}
+CODE_ACTIONS = dict([(code, action) for action, code in ACTION_CODES.items()])
+
+OUTCOME_NONE, OUTCOME_WIN, OUTCOME_LOSS = 0, 1, 2
+
+_HEADER = struct.Struct('<BBBI20sI')
+_COUNT = struct.Struct('<H')
+_SCORE = struct.Struct('<Id')
+_END = struct.Struct('<IdB')
+
+
+def layoutHash(layoutText):
+    """
+    Returns the SHA-1 digest identifying a layout's text.
+    """
+    return hashlib.sha1('\n'.join(layoutText).encode('utf-8')).digest()
+
+
+def packActions(codes):
+    """
+    Packs a list of 3-bit action codes eight to three bytes.
+    """
+    packed = bytearray()
+    for start in range(0, len(codes), 8):
+        value = 0
+        for shift, code in enumerate(codes[start:start + 8]):
+            value |= code << (3 * shift)
+        packed += value.to_bytes(3, 'little')
+    return bytes(packed)
+
+
+def unpackActions(packed, count):
+    """
+    Returns the first count action codes packed by packActions.
+    """
+    codes = []
+    for start in range(0, len(packed), 3):
+        value = int.from_bytes(packed[start:start + 3], 'little')
+        for shift in range(8):
+            codes.append((value >> (3 * shift)) & 7)
+    return codes[:count]
+
+
+class ReplayWriter:
+    """
+    Streams a game to a replay file as it is played.  Give it to a Game as
+    its replayWriter; the Game calls recordMove after every move, and the
+    caller closes the writer with the final state once the game is over.
+
+    Moves are buffered and written chunkSize at a time.  Every
+    checkpointInterval turns (if nonzero) the score is written as well, so
+    that a replay can be checked against the recording.
+    """
+
+    def __init__(self, out, layout, numAgents, startingIndex=0, checkpointInterval=200, chunkSize=4096):
+        """
+        out is a path or a file opened for binary writing.
+        """
+        if isinstance(out, str):
+            out = open(out, 'wb')
+        self.out = out
+        self.checkpointInterval = checkpointInterval
+        self.chunkSize = min(chunkSize, 0xffff)
+        self.numTurns = 0
+        self.pending = []
+
+        layoutText = zlib.compress('\n'.join(layout.layoutText).encode('utf-8'))
+        out.write(MAGIC)
+        out.write(_HEADER.pack(VERSION, numAgents, startingIndex, checkpointInterval,
+                               layoutHash(layout.layoutText), len(layoutText)))
+        out.write(layoutText)
+
+    def recordMove(self, action, state):
+        """
+        Records that the agent whose turn it was took action, giving state.
+        """
+        self.pending.append(ACTION_CODES[action])
+        self.numTurns += 1
+        if len(self.pending) >= self.chunkSize:
+            self.flush()
+        if self.checkpointInterval and self.numTurns % self.checkpointInterval == 0:
+            self.flush()
+            self.out.write(b'S' + _SCORE.pack(self.numTurns, state.getScore()))
+
+    def flush(self):
+        if self.pending:
+            self.out.write(b'A' + _COUNT.pack(len(self.pending)) + packActions(self.pending))
+            self.pending = []
+
+    def close(self, state):
+        """
+        Ends the recording with the final state of the game.
+        """
+        self.flush()
+        outcome = OUTCOME_NONE
+        if state.isWin():
+            outcome = OUTCOME_WIN
+        elif state.isLose():
+            outcome = OUTCOME_LOSS
+        self.out.write(b'E' + _END.pack(self.numTurns, state.getScore(), outcome))
+        self.out.close()
+
+
+class Replay:
+    """
+    A recorded game: its layout, the number of agents, and the action of
+    every turn.
+
+    stateAt rebuilds the state after any turn without a display.  It keeps
+    the state every keyframeInterval turns as it goes, so later seeks only
+    fast-forward from the nearest earlier keyframe.
+    """
+
+    def __init__(self, layout, numAgents, startingIndex, codes, checkpoints, finalScore=None, outcome=OUTCOME_NONE,
+                 keyframeInterval=256):
+        self.layout = layout
+        self.numAgents = numAgents
+        self.startingIndex = startingIndex
+        self.codes = codes
+        self.checkpoints = checkpoints
+        self.finalScore = finalScore
+        self.outcome = outcome
+        self.keyframeInterval = keyframeInterval
+        self.keyframes = {}
+
+    def getNumTurns(self):
+        return len(self.codes)
+
+    def getMove(self, turn):
+        """
+        Returns the (agentIndex, action) of the given turn, counting from 0.
+        """
+        agentIndex = (self.startingIndex + turn) % self.numAgents
+        return agentIndex, CODE_ACTIONS[self.codes[turn]]
+
+    def getMoveHistory(self):
+        """
+        Returns the moves as the Game's moveHistory lists them.
+        """
+        return [self.getMove(turn) for turn in range(len(self.codes))]
+
+    def initialState(self):
+        from pacman import GameState
+        state = GameState()
+        state.initialize(self.layout, self.numAgents - 1)
+        return state
+
+    def stateAt(self, turn):
+        """
+        Returns the state after the first turn moves.
+        """
+        if turn < 0 or turn > len(self.codes):
+            raise IndexError('turn %d is outside the recorded game' % turn)
+        start = turn - turn % self.keyframeInterval
+        while start > 0 and start not in self.keyframes:
+            start -= self.keyframeInterval
+        state = self.keyframes[start] if start > 0 else self.initialState()
+        for t in range(start, turn):
+            state = state.generateSuccessor(*self.getMove(t))
+            if (t + 1) % self.keyframeInterval == 0:
+                self.keyframes[t + 1] = state
+        return state
+
+    def verify(self):
+        """
+        Replays the whole game, raising an exception if a score checkpoint or
+        the final score does not match the recording.
+        """
+        state = self.initialState()
+        expected = dict(self.checkpoints)
+        if self.finalScore != None:
+            expected[len(self.codes)] = self.finalScore
+        for turn in range(len(self.codes)):
+            state = state.generateSuccessor(*self.getMove(turn))
+            if turn + 1 in expected and state.getScore() != expected[turn + 1]:
+                raise Exception('Replay diverged: score %s after turn %d, recorded %s' % (
+                    state.getScore(), turn + 1, expected[turn + 1]))
+        return state
+
+
+def isReplayFile(path):
+    f = open(path, 'rb')
+    try:
+        return f.read(len(MAGIC)) == MAGIC
+    finally:
+        f.close()
+
+
+def readReplay(path):
+    """
+    Loads the replay file at path as a Replay.
+    """
+    f = open(path, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    if not data.startswith(MAGIC):
+        raise Exception('%s is not a replay file' % path)
+    offset = len(MAGIC)
+    version, numAgents, startingIndex, checkpointInterval, digest, textLength = \
+        _HEADER.unpack_from(data, offset)
+    if version != VERSION:
+        raise Exception('Unsupported replay version %d' % version)
+    offset += _HEADER.size
+    layoutText = zlib.decompress(data[offset:offset + textLength]).decode('utf-8').split('\n')
+    offset += textLength
+    if layoutHash(layoutText) != digest:
+        raise Exception('Layout of %s does not match its hash' % path)
+
+    codes, checkpoints = [], []
+    finalScore, outcome = None, OUTCOME_NONE
+    while offset < len(data):
+        tag = data[offset:offset + 1]
+        offset += 1
+        if tag == b'A':
+            count, = _COUNT.unpack_from(data, offset)
+            offset += _COUNT.size
+            length = 3 * ((count + 7) // 8)
+            codes.extend(unpackActions(data[offset:offset + length], count))
+            offset += length
+        elif tag == b'S':
+            checkpoints.append(_SCORE.unpack_from(data, offset))
+            offset += _SCORE.size
+        elif tag == b'E':
+            numTurns, finalScore, outcome = _END.unpack_from(data, offset)
+            offset += _END.size
+        else:
+            raise Exception('Corrupt replay file %s at byte %d' % (path, offset - 1))
+    return Replay(layout.Layout(layoutText), numAgents, startingIndex, codes, checkpoints, finalScore, outcome)
@@ -233,6 +233,150 @@ class PriorityQueueWithFunction(PriorityQueue):
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
 
+_REMOVED = object()     # marks a lazily removed IndexedPriorityQueue entry
+
+
+class IndexedPriorityQueue:
+    """
+    A priority queue of distinct items that keeps track of where each item
+    is, so that membership tests are O(1) and changing the priority of an
+    item is O(log n) instead of the linear scan of PriorityQueue.update.
+
+    Items must be hashable.  Ties between equal priorities go to the item
+    pushed first, as in PriorityQueue.
+
+    By default the queue is a binary heap with a map from each item to its
+    position in the heap.  With lazy=True it is a heapq heap instead, and an
+    entry whose priority changes is marked removed and pushed again; removed
+    entries are skipped when they come to the top, and cleared out whenever
+    they outnumber the items in the queue.
+    """
+    def __init__(self, lazy=False):
+        self.lazy = lazy
+        self.heap = []          # entries [priority, count, item]
+        self.entries = {}       # item -> its entry
+        self.positions = {}     # item -> index of its entry in the heap
+        self.count = 0
+        self.removed = 0
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def isEmpty(self):
+        return len(self.entries) == 0
+
+    def getPriority(self, item):
+        return self.entries[item][0]
+
+    def push(self, item, priority):
+        """
+        Adds item to the queue.  If item is already in the queue, its
+        priority is replaced and it goes after the items that already have
+        the new priority, as if it had just been pushed.
+        """
+        if item in self.entries:
+            self.remove(item)
+        self._insert([priority, self.count, item])
+        self.count += 1
+
+    def pop(self):
+        "Removes and returns the item with the lowest priority"
+        if self.lazy:
+            entry = heapq.heappop(self.heap)
+            while entry[2] is _REMOVED:
+                self.removed -= 1
+                entry = heapq.heappop(self.heap)
+            item = entry[2]
+        else:
+            item = self.heap[0][2]
+            self._delete(0)
+        del self.entries[item]
+        return item
+
+    def update(self, item, priority):
+        """
+        The same as PriorityQueue.update: if item is in the queue with a
+        higher priority, its priority is lowered, keeping its place among
+        items of equal priority; if item is not in the queue it is pushed.
+        """
+        entry = self.entries.get(item)
+        if entry == None:
+            self.push(item, priority)
+        elif priority < entry[0]:
+            if self.lazy:
+                self.remove(item)
+                self._insert([priority, entry[1], item])
+            else:
+                entry[0] = priority
+                self._siftUp(self.positions[item])
+
+    def remove(self, item):
+        "Removes item from the queue"
+        entry = self.entries.pop(item)
+        if not self.lazy:
+            self._delete(self.positions[item])
+            return
+        entry[2] = _REMOVED
+        self.removed += 1
+        if self.removed > len(self.entries):
+            self.heap = [entry for entry in self.heap if entry[2] is not _REMOVED]
+            heapq.heapify(self.heap)
+            self.removed = 0
+
+    def _insert(self, entry):
+        self.entries[entry[2]] = entry
+        if self.lazy:
+            heapq.heappush(self.heap, entry)
+        else:
+            self.heap.append(entry)
+            self.positions[entry[2]] = len(self.heap) - 1
+            self._siftUp(len(self.heap) - 1)
+
+    def _delete(self, index):
+        # Removes the entry at index from the binary heap
+        heap = self.heap
+        del self.positions[heap[index][2]]
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            self.positions[last[2]] = index
+            self._siftUp(index)
+            self._siftDown(self.positions[last[2]])
+
+    def _siftUp(self, index):
+        heap, positions = self.heap, self.positions
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[parent] <= entry:
+                break
+            heap[index] = heap[parent]
+            positions[heap[index][2]] = index
+            index = parent
+        heap[index] = entry
+        positions[entry[2]] = index
+
+    def _siftDown(self, index):
+        heap, positions = self.heap, self.positions
+        entry = heap[index]
+        size = len(heap)
+        child = 2 * index + 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[index] = heap[child]
+            positions[heap[index][2]] = index
+            index = child
+            child = 2 * index + 1
+        heap[index] = entry
+        positions[entry[2]] = index
+
+
 def manhattanDistance(xy1, xy2):
     "Returns the Manhattan distance between points xy1 and xy2"
     return abs(xy1[0] - xy2[0]) + abs(xy1[1] - xy2[1])
@@ -641,13 +785,25 @@ def pause():
 
 # code to handle timeouts
 #
-# FIXME
-# NOTE: TimeoutFuncton is NOT reentrant.  Later timeouts will silently
-# disable earlier timeouts.  Could be solved by maintaining a global list
-# of active time outs.  Currently, questions which have test cases calling
-# this have all student code so wrapped.
+# Work is given a Deadline: a budget in milliseconds.  callWithDeadline
+# enforces it in one of three modes:
+#
+#   DEADLINE_SIGNAL       an interval timer interrupts the work when the
+#                         budget runs out (main thread only, where SIGALRM
+#                         exists)
+#   DEADLINE_COOPERATIVE  the work runs to completion and is rejected
+#                         afterwards if it overran; it may stop early by
+#                         polling checkDeadline() or getActiveDeadline()
+#   DEADLINE_PROCESS      the work runs in a forked worker process that is
+#                         killed when the budget runs out.  Changes the work
+#                         makes to the objects it was given stay in the worker
+#
+# Deadlines nest: each thread keeps a stack of the deadlines it is running
+# under, and an interval timer armed for an inner deadline is restored for
+# the outer one afterwards.
 #
 import signal
+import threading
 import time
 
 
@@ -656,7 +812,241 @@ class TimeoutFunctionException(Exception):
     pass
 
 
+class DeadlineExceeded(TimeoutFunctionException):
+    """
+    Raised when work runs past its Deadline, which is kept as deadline (None
+    when the work was given no time at all).
+    """
+
+    def __init__(self, deadline=None):
+        TimeoutFunctionException.__init__(self)
+        self.deadline = deadline
+
+
+DEADLINE_SIGNAL = 'signal'
+DEADLINE_COOPERATIVE = 'cooperative'
+DEADLINE_PROCESS = 'process'
+DEADLINE_MODES = [DEADLINE_SIGNAL, DEADLINE_COOPERATIVE, DEADLINE_PROCESS]
+
+
+class Deadline:
+    """
+    A time budget in milliseconds, measured from when the Deadline is made.
+    """
+    __slots__ = ('budget', 'start', 'end')
+
+    def __init__(self, milliseconds):
+        self.budget = milliseconds
+        self.start = time.perf_counter()
+        self.end = self.start + milliseconds / 1000.0
+
+    def elapsed(self):
+        """
+        Returns the milliseconds spent since the deadline was set.
+        """
+        return (time.perf_counter() - self.start) * 1000.0
+
+    def remaining(self):
+        """
+        Returns the milliseconds left, which is negative once expired.
+        """
+        return (self.end - time.perf_counter()) * 1000.0
+
+    def expired(self):
+        return time.perf_counter() >= self.end
+
+    def check(self):
+        """
+        Raises DeadlineExceeded if the deadline has passed.
+        """
+        if time.perf_counter() >= self.end:
+            raise DeadlineExceeded(self)
+
+
+_deadlines = threading.local()
+
+
+def _deadlineStack():
+    try:
+        return _deadlines.stack
+    except AttributeError:
+        _deadlines.stack = []
+        return _deadlines.stack
+
+
+def getActiveDeadline():
+    """
+    Returns the innermost Deadline the calling code runs under, or None.
+    """
+    stack = _deadlineStack()
+    if stack:
+        return stack[-1]
+    return None
+
+
+def checkDeadline():
+    """
+    Raises DeadlineExceeded if the innermost Deadline the calling code runs
+    under has passed.  Cheap enough to call from the inner loop of a search.
+    """
+    stack = _deadlineStack()
+    if stack and time.perf_counter() >= stack[-1].end:
+        raise DeadlineExceeded(stack[-1])
+
+
+def exceededOuterDeadline(exception):
+    """
+    Returns whether exception, raised out of callWithDeadline, is for a
+    deadline that the caller itself still runs under, such as a grader's
+    limit that ran out during the call, rather than for the call's own.
+    Such an exception should be passed on instead of charged to the call.
+    """
+    deadline = getattr(exception, 'deadline', None)
+    return deadline != None and deadline in _deadlineStack()
+
+
+def defaultDeadlineMode():
+    """
+    Returns DEADLINE_SIGNAL where the calling thread can use interval timers,
+    and DEADLINE_COOPERATIVE otherwise.
+    """
+    if hasattr(signal, 'setitimer') and threading.current_thread() is threading.main_thread():
+        return DEADLINE_SIGNAL
+    return DEADLINE_COOPERATIVE
+
+
+def callWithDeadline(function, milliseconds, args=(), keyArgs={}, mode=None):
+    """
+    Returns function(*args, **keyArgs), raising DeadlineExceeded if the call
+    takes longer than milliseconds.  The mode is one of DEADLINE_MODES and
+    defaults to defaultDeadlineMode(); DEADLINE_SIGNAL falls back to
+    DEADLINE_COOPERATIVE where it is unavailable.
+    """
+    if milliseconds <= 0:
+        raise DeadlineExceeded()
+    if mode == None or (mode == DEADLINE_SIGNAL and defaultDeadlineMode() != DEADLINE_SIGNAL):
+        mode = defaultDeadlineMode()
+    deadline = Deadline(milliseconds)
+    stack = _deadlineStack()
+    stack.append(deadline)
+    try:
+        if mode == DEADLINE_SIGNAL:
+            result = _callWithTimer(function, args, keyArgs, deadline)
+        elif mode == DEADLINE_PROCESS:
+            result = _callInProcess(function, args, keyArgs, deadline)
+        elif mode == DEADLINE_COOPERATIVE:
+            result = function(*args, **keyArgs)
+        else:
+            raise Exception('Unknown deadline mode: ' + str(mode))
+    finally:
+        stack.pop()
+    deadline.check()
+    return result
+
+
+# The SIGALRM handler that was installed before _handleDeadlineTimer, which
+# stays installed once set.  Code that installs a SIGALRM handler of its own
+# while deadlines are in use must put back the one it found.
+_outerAlarmHandler = None
+_deadlineTimerInstalled = False
+
+
+def _handleDeadlineTimer(signum, frame):
+    stack = _deadlineStack()
+    for deadline in stack:
+        if deadline.expired():
+            raise DeadlineExceeded(deadline)
+    # The timer belonged to someone else, or fired a little early
+    if callable(_outerAlarmHandler):
+        _outerAlarmHandler(signum, frame)
+    if stack:
+        earliest = min([deadline.end for deadline in stack])
+        signal.setitimer(signal.ITIMER_REAL, max(earliest - time.perf_counter(), 1e-6))
+
+
+def _callWithTimer(function, args, keyArgs, deadline):
+    global _outerAlarmHandler, _deadlineTimerInstalled
+    if not _deadlineTimerInstalled:
+        _outerAlarmHandler = signal.signal(signal.SIGALRM, _handleDeadlineTimer)
+        _deadlineTimerInstalled = True
+    seconds = deadline.budget / 1000.0
+    outerSeconds = signal.setitimer(signal.ITIMER_REAL, seconds)[0]
+    if 0 < outerSeconds < seconds:
+        signal.setitimer(signal.ITIMER_REAL, outerSeconds)
+    try:
+        return function(*args, **keyArgs)
+    finally:
+        if outerSeconds > 0:
+            outerLeft = outerSeconds - (time.perf_counter() - deadline.start)
+            signal.setitimer(signal.ITIMER_REAL, max(outerLeft, 1e-6))
+        else:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _callInProcess(function, args, keyArgs, deadline):
+    import multiprocessing
+    try:
+        context = multiprocessing.get_context('fork')
+    except ValueError:  # no fork on this platform
+        context = None
+    if context == None or multiprocessing.current_process().daemon:
+        # Daemonic pool workers may not start processes of their own
+        return function(*args, **keyArgs)
+    receiver, sender = context.Pipe(duplex=False)
+    worker = context.Process(target=_runInWorker,
+                             args=(sender, function, args, keyArgs))
+    worker.start()
+    sender.close()
+    try:
+        if not receiver.poll(max(deadline.remaining(), 0) / 1000.0):
+            raise DeadlineExceeded(deadline)
+        try:
+            succeeded, value, attributes = receiver.recv()
+        except EOFError:
+            raise Exception('Worker process exited without a result')
+    finally:
+        if worker.is_alive():
+            worker.terminate()
+        worker.join()
+        receiver.close()
+    if attributes:
+        function.__self__.__dict__.update(attributes)
+    if not succeeded:
+        raise value
+    return value
+
+
+def _runInWorker(sender, function, args, keyArgs):
+    """
+    Calls function in a worker process and sends back whether it succeeded,
+    its result or exception and, for a bound method, the attributes of its
+    object that can be pickled, so that an agent keeps what it computed.
+    """
+    import pickle
+    try:
+        succeeded, value = True, function(*args, **keyArgs)
+    except Exception as exception:
+        succeeded, value = False, exception
+    attributes = {}
+    for name, attribute in getattr(getattr(function, '__self__', None), '__dict__', {}).items():
+        try:
+            pickle.dumps(attribute)
+        except Exception:  # such as lambdas, which are left as they were
+            continue
+        attributes[name] = attribute
+    try:
+        sender.send((succeeded, value, attributes))
+    except Exception:  # the result or exception cannot be pickled
+        sender.send((False, Exception(repr(value)), attributes))
+    sender.close()
+
+
 class TimeoutFunction:
+    """
+    Wraps function so that calling it raises TimeoutFunctionException once
+    it has run for timeout seconds.  See callWithDeadline.
+    """
+
     def __init__(self, function, timeout):
         self.timeout = timeout
         self.function = function
@@ -665,24 +1055,7 @@ class TimeoutFunction:
         raise TimeoutFunctionException()
 
     def __call__(self, *args, **keyArgs):
-        # If we have SIGALRM signal, use it to cause an exception if and
-        # when this function runs too long.  Otherwise check the time taken
-        # after the method has returned, and throw an exception then.
-        if hasattr(signal, 'SIGALRM'):
-            old = signal.signal(signal.SIGALRM, self.handle_timeout)
-            signal.alarm(self.timeout)
-            try:
-                result = self.function(*args, **keyArgs)
-            finally:
-                signal.signal(signal.SIGALRM, old)
-            signal.alarm(0)
-        else:
-            startTime = time.time()
-            result = self.function(*args, **keyArgs)
-            timeElapsed = time.time() - startTime
-            if timeElapsed >= self.timeout:
-                self.handle_timeout(None, None)
-        return result
+        return callWithDeadline(self.function, self.timeout * 1000, args, keyArgs)
 
 
 _ORIGINAL_STDOUT = None
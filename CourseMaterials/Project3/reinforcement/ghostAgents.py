@@ -57,10 +57,9 @@ class DirectionalGhost(GhostAgent):
 
     def getDistribution(self, state):
         # Read variables from state
-        ghostState = state.getGhostState(self.index)
         legalActions = state.getLegalActions(self.index)
         pos = state.getGhostPosition(self.index)
-        isScared = ghostState.scaredTimer > 0
+        isScared = state.getGhostScaredTimes()[self.index - 1] > 0
 
         speed = 1
         if isScared:
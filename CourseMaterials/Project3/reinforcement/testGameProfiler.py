@@ -0,0 +1,84 @@
+# testGameProfiler.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Plays short games under a gameProfiler.GameProfiler and checks what it
+records.
+
+  python -m unittest testGameProfiler
+"""
+
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import gameProfiler
+import ghostAgents
+import layout
+import pacman
+import pacmanAgents
+import textDisplay
+
+
+def playProfiledGame(profiler, seed=0):
+    random.seed(seed)
+    rules = pacman.ClassicGameRules()
+    game = rules.newGame(layout.getLayout('testClassic'), pacmanAgents.GreedyAgent(),
+                         [ghostAgents.RandomGhost(1)], textDisplay.NullGraphics(), True)
+    game.profiler = profiler
+    game.run()
+    return game
+
+
+class GameProfilerTest(unittest.TestCase):
+
+    def testSummary(self):
+        profiler = gameProfiler.GameProfiler(countSuccessors=True)
+        game = playProfiledGame(profiler)
+        summary = profiler.getSummary()
+        self.assertEqual(summary['games'], 1)
+        phases = dict([((phase['agent'], phase['phase']), phase) for phase in summary['phases']])
+        pacmanMoves = len([move for move in game.moveHistory if move[0] == 0])
+        self.assertEqual(phases[(0, 'getAction')]['calls'], pacmanMoves)
+        self.assertEqual(phases[(0, 'generateSuccessor')]['calls'], pacmanMoves)
+        # GreedyAgent looks at the successor of each legal action
+        self.assertTrue(phases[(0, 'getAction')]['successors'] >= pacmanMoves)
+        self.assertTrue(summary['wall'] > 0)
+
+    def testMergeAndTrace(self):
+        profiler = gameProfiler.GameProfiler(traceMoves=True)
+        for seed in range(2):
+            spawned = profiler.spawn()
+            playProfiledGame(spawned, seed)
+            profiler.merge(spawned)
+        self.assertEqual(profiler.getSummary()['games'], 2)
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        try:
+            profiler.writeTrace(path)
+            f = open(path)
+            try:
+                events = json.load(f)['traceEvents']
+            finally:
+                f.close()
+        finally:
+            os.remove(path)
+        self.assertEqual(len(events), len(profiler.events))
+        self.assertEqual(set([event['pid'] for event in events]), set([1, 2]))
+
+
+if __name__ == '__main__':
+    unittest.main()
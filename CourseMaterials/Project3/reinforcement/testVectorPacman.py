@@ -0,0 +1,61 @@
+# testVectorPacman.py
+# -------------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Checks that vectorPacman plays by the same rules as pacman.py.
+
+  python -m unittest testVectorPacman
+"""
+
+import unittest
+
+import layout
+import vectorPacman
+
+
+class VectorGamesTest(unittest.TestCase):
+
+    def testMatchesRules(self):
+        for name in ['testClassic', 'smallClassic']:
+            turns = vectorPacman.checkAgainstRules(layout.getLayout(name), numGames=8, numTurns=300)
+            self.assertTrue(turns > 0, name)
+
+    def testStepRoundEndsGames(self):
+        games = vectorPacman.VectorGames(layout.getLayout('testClassic'), 16, seed=1)
+        for round in range(1000):
+            if games.done.all():
+                break
+            games.stepRound(games.randomActions(0))
+        self.assertTrue(games.done.all())
+        for i in range(16):
+            state = games.getState(i)
+            self.assertTrue(state.isWin() or state.isLose())
+
+    def testFoodHashChangesWhenEaten(self):
+        lay = layout.getLayout('testClassic')
+        games = vectorPacman.VectorGames(lay, 1, numGhosts=0, seed=0)
+        before = games.getState(0).getFood()
+        self.assertEqual(hash(before), hash(lay.food))
+        for turn in range(100):
+            if games.done[0] or games.getState(0).getNumFood() < lay.totalFood:
+                break
+            games.step(0, games.randomActions(0))
+        after = games.getState(0).getFood()
+        self.assertNotEqual(after, before)
+        self.assertNotEqual(hash(after), hash(before))
+        self.assertEqual(hash(after), hash(after.bits))
+
+
+if __name__ == '__main__':
+    unittest.main()
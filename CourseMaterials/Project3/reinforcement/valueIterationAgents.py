@@ -162,7 +162,7 @@ class PrioritizedSweepingValueIterationAgent(ValueIterationAgent):
                         if nextState == state and probs > 0:
                             predecessors[state].add(otherState)
 
-        pq = util.PriorityQueue()
+        pq = util.IndexedPriorityQueue()
         for s in self.mdp.getStates():
             if self.mdp.isTerminal(s):
                 continue
@@ -0,0 +1,319 @@
+# vectorPacman.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Many Pacman games on one layout, stepped together with NumPy.
+
+VectorGames holds the state of every game in arrays rather than GameState
+objects, and moves one agent in all the games at once, following the same
+rules as PacmanRules and GhostRules.  This is meant for training and
+evaluating agents over many games:
+
+  games = VectorGames(layout.getLayout('smallClassic'), 256, seed=0)
+  while not games.done.all():
+      rewards = games.stepRound(games.randomActions(0))
+
+Actions are numbered as in replay.py: North 0, South 1, East 2, West 3 and
+Stop 4.  Positions are kept in half cells, since scared ghosts move at half
+speed, so a position (x, y) of the engine is (2x, 2y) here.
+
+testVectorPacman.py checks it against the rules.
+"""
+
+import numpy as np
+from game import BitGrid, Configuration, Directions
+from pacman import GameState, SCARED_TIME, COLLISION_TOLERANCE, TIME_PENALTY
+
+ACTIONS = [Directions.NORTH, Directions.SOUTH,
+           Directions.EAST, Directions.WEST, Directions.STOP]
+NORTH, SOUTH, EAST, WEST, STOP = range(5)
+ACTION_CODES = dict([(action, code) for code, action in enumerate(ACTIONS)])
+
+_VECTORS = np.array([(0, 1), (0, -1), (1, 0), (-1, 0), (0, 0)])
+_REVERSE = np.array([SOUTH, NORTH, WEST, EAST, STOP])
+
+# Ghosts kill or are eaten within COLLISION_TOLERANCE, which is this many
+# half cells of manhattan distance
+_KILL_DISTANCE = int(2 * COLLISION_TOLERANCE)
+
+
+class VectorGames:
+    """
+    numGames games of Pacman on one layout.  The state of game i is
+
+      positions[i, agent]      (x, y) in half cells
+      directions[i, agent]     the action code the agent last moved in
+      scaredTimers[i, agent]
+      food[i, cell]            cell x * height + y holds food
+      capsules[i, cell]
+      numFood[i], scores[i], wins[i], losses[i] and done[i]
+
+    The arrays are the games' state, not copies of it.  Finished games are
+    left as they ended: step ignores them until they are reset.
+    """
+
+    def __init__(self, layout, numGames, numGhosts=None, seed=None):
+        if numGhosts == None:
+            numGhosts = layout.getNumGhosts()
+        self.layout = layout
+        self.numGames = numGames
+        self.random = np.random.RandomState(seed)
+
+        # The starting positions, in the order GameStateData.initialize
+        # takes them
+        starts = []
+        for isPacman, pos in layout.agentPositions:
+            if not isPacman:
+                if len(starts) - 1 == numGhosts:
+                    continue
+            starts.append(pos)
+        self.numAgents = len(starts)
+        self.starts = 2 * np.array(starts, dtype=np.int64)
+
+        width, height = layout.width, layout.height
+        self.width, self.height = width, height
+        walls = np.array([[layout.walls[x][y] for y in range(height)]
+                          for x in range(width)], dtype=bool)
+        self.startFood = np.array([[layout.food[x][y] for y in range(height)]
+                                   for x in range(width)], dtype=bool).ravel()
+        self.startCapsules = np.zeros(width * height, dtype=bool)
+        for x, y in layout.capsules:
+            self.startCapsules[x * height + y] = True
+
+        # pacmanActions[cell, action]: Pacman may take action in cell
+        # ghostActions[cell, direction, action]: a ghost that last moved in
+        # direction may take action in cell (at a whole cell)
+        padded = np.ones((width + 2, height + 2), dtype=bool)
+        padded[1:-1, 1:-1] = walls
+        openMoves = np.empty((width * height, 5), dtype=bool)
+        for code, (dx, dy) in enumerate(_VECTORS):
+            openMoves[:, code] = ~padded[1 + dx:1 + dx + width,
+                                         1 + dy:1 + dy + height].ravel()
+        self.pacmanActions = openMoves
+        moves = openMoves.copy()
+        moves[:, STOP] = False
+        ghostActions = np.repeat(moves[:, None, :], 5, axis=1)
+        # Ghosts cannot turn around unless they reach a dead end
+        turns = moves.sum(axis=1) > 1
+        for direction in range(5):
+            ghostActions[turns, direction, _REVERSE[direction]] = False
+        self.ghostActions = ghostActions
+
+        self.positions = np.zeros((numGames, self.numAgents, 2), dtype=np.int64)
+        self.directions = np.zeros((numGames, self.numAgents), dtype=np.int64)
+        self.scaredTimers = np.zeros((numGames, self.numAgents), dtype=np.int64)
+        self.food = np.zeros((numGames, width * height), dtype=bool)
+        self.capsules = np.zeros((numGames, width * height), dtype=bool)
+        self.numFood = np.zeros(numGames, dtype=np.int64)
+        self.scores = np.zeros(numGames, dtype=np.int64)
+        self.wins = np.zeros(numGames, dtype=bool)
+        self.losses = np.zeros(numGames, dtype=bool)
+        self.done = np.zeros(numGames, dtype=bool)
+        self.reset()
+
+    def reset(self, games=None):
+        """
+        Starts the given games (an index array or mask; all by default) over.
+        """
+        if games is None:
+            games = slice(None)
+        self.positions[games] = self.starts
+        self.directions[games] = STOP
+        self.scaredTimers[games] = 0
+        self.food[games] = self.startFood
+        self.capsules[games] = self.startCapsules
+        self.numFood[games] = self.startFood.sum()
+        self.scores[games] = 0
+        self.wins[games] = False
+        self.losses[games] = False
+        self.done[games] = False
+
+    def _cells(self, positions):
+        return (positions[..., 0] // 2) * self.height + positions[..., 1] // 2
+
+    def getLegalActions(self, agentIndex):
+        """
+        Returns a (numGames, 5) boolean array of the actions agentIndex may
+        take in each game.
+        """
+        positions = self.positions[:, agentIndex]
+        cells = self._cells(positions)
+        if agentIndex == 0:
+            return self.pacmanActions[cells]
+        directions = self.directions[:, agentIndex]
+        legal = self.ghostActions[cells, directions]
+        # Between cells, ghosts must continue straight
+        between = (positions % 2).any(axis=1)
+        if between.any():
+            legal[between] = False
+            legal[between, directions[between]] = True
+        return legal
+
+    def randomActions(self, agentIndex):
+        """
+        Returns an action for agentIndex in every game, chosen uniformly at
+        random among its legal actions as RandomGhost does.
+        """
+        legal = self.getLegalActions(agentIndex)
+        choice = np.floor(self.random.random_sample(self.numGames)
+                          * legal.sum(axis=1))
+        return np.argmax(legal.cumsum(axis=1) > choice[:, None], axis=1)
+
+    def step(self, agentIndex, actions):
+        """
+        Has agentIndex take actions[i] in every game i that is not over, as
+        GameState.generateSuccessor does, and returns the change in each
+        game's score.
+        """
+        actions = np.asarray(actions)
+        games = np.flatnonzero(~self.done)
+        actions = actions[games]
+        legal = self.getLegalActions(agentIndex)[games, actions]
+        if not legal.all():
+            illegal = np.argmin(legal)
+            raise Exception('Illegal action %s for agent %d in game %d' % (
+                ACTIONS[actions[illegal]], agentIndex, games[illegal]))
+
+        scoreChange = np.zeros(self.numGames, dtype=np.int64)
+        if agentIndex == 0:
+            self._movePacman(games, actions, scoreChange)
+        else:
+            self._moveGhost(agentIndex, games, actions, scoreChange)
+        self.scores += scoreChange
+        np.logical_or(self.wins, self.losses, out=self.done)
+        return scoreChange
+
+    def stepRound(self, pacmanActions, ghostPolicy=None):
+        """
+        Moves Pacman and then each ghost in every game that is not over, and
+        returns the change in each game's score.  ghostPolicy(games,
+        agentIndex) returns the ghosts' actions, and by default they move at
+        random.
+        """
+        if ghostPolicy == None:
+            ghostPolicy = lambda games, agentIndex: games.randomActions(agentIndex)
+        scoreChange = self.step(0, pacmanActions)
+        for agentIndex in range(1, self.numAgents):
+            if self.done.all():
+                break
+            scoreChange += self.step(agentIndex, ghostPolicy(self, agentIndex))
+        return scoreChange
+
+    def _movePacman(self, games, actions, scoreChange):
+        positions = self.positions[games, 0] + 2 * _VECTORS[actions]
+        self.positions[games, 0] = positions
+        moved = actions != STOP  # Stopping keeps the direction
+        self.directions[games[moved], 0] = actions[moved]
+
+        # Eat
+        cells = self._cells(positions)
+        eaten = self.food[games, cells]
+        ate = games[eaten]
+        self.food[ate, cells[eaten]] = False
+        self.numFood[ate] -= 1
+        scoreChange[ate] += 10
+        won = ate[self.numFood[ate] == 0]
+        scoreChange[won] += 500
+        self.wins[won] = True
+        capsule = self.capsules[games, cells]
+        self.capsules[games[capsule], cells[capsule]] = False
+        self.scaredTimers[games[capsule], 1:] = SCARED_TIME
+
+        # Time passes
+        scoreChange[games] -= TIME_PENALTY
+
+        # Anyone can kill him
+        for agentIndex in range(1, self.numAgents):
+            self._checkDeath(games, agentIndex, scoreChange)
+
+    def _moveGhost(self, agentIndex, games, actions, scoreChange):
+        timers = self.scaredTimers[games, agentIndex]
+        speed = np.where(timers > 0, 1, 2)
+        positions = self.positions[games, agentIndex] + speed[:, None] * _VECTORS[actions]
+        # Time passes; ghosts that stop being scared snap to a whole cell
+        positions[timers == 1] += positions[timers == 1] % 2
+        self.positions[games, agentIndex] = positions
+        self.directions[games, agentIndex] = actions
+        self.scaredTimers[games, agentIndex] = np.maximum(0, timers - 1)
+        self._checkDeath(games, agentIndex, scoreChange)
+
+    def _checkDeath(self, games, agentIndex, scoreChange):
+        distances = np.abs(self.positions[games, agentIndex]
+                           - self.positions[games, 0]).sum(axis=1)
+        games = games[distances <= _KILL_DISTANCE]
+        if len(games) == 0:
+            return
+        scared = self.scaredTimers[games, agentIndex] > 0
+        eaten = games[scared]
+        scoreChange[eaten] += 200
+        self.positions[eaten, agentIndex] = self.starts[agentIndex]
+        self.directions[eaten, agentIndex] = STOP
+        self.scaredTimers[eaten, agentIndex] = 0
+        killed = games[~scared & ~self.wins[games]]
+        scoreChange[killed] -= 500
+        self.losses[killed] = True
+
+    def getState(self, game):
+        """
+        Returns game as a GameState, for agents written against the engine.
+        """
+        state = GameState()
+        state.initialize(self.layout, self.numAgents - 1)
+        data = state.data
+        for agentIndex, agentState in enumerate(data.agentStates):
+            pos = tuple([p // 2 if p % 2 == 0 else p / 2.0
+                         for p in self.positions[game, agentIndex].tolist()])
+            agentState.configuration = Configuration(
+                pos, ACTIONS[self.directions[game, agentIndex]])
+            agentState.scaredTimer = int(self.scaredTimers[game, agentIndex])
+        data.food = BitGrid.fromBits(self.width, self.height, int.from_bytes(
+            np.packbits(self.food[game], bitorder='little').tobytes(), 'little'))
+        data.capsules = [pos for pos in self.layout.capsules
+                         if self.capsules[game, pos[0] * self.height + pos[1]]]
+        data.score = int(self.scores[game])
+        data._win = bool(self.wins[game])
+        data._lose = bool(self.losses[game])
+        data._computeZobrist()
+        return state
+
+
+def checkAgainstRules(layout, numGames=16, numTurns=2000, seed=0):
+    """
+    Plays numGames games of random moves both in a VectorGames and through
+    GameState.generateSuccessor, raising an exception if any game's state
+    differs after any turn.  Returns the number of turns compared.
+    """
+    games = VectorGames(layout, numGames, seed=seed)
+    states = [games.getState(i) for i in range(numGames)]
+    turns = 0
+    for turn in range(numTurns):
+        if games.done.all():
+            break
+        agentIndex = turn % games.numAgents
+        actions = games.randomActions(agentIndex)
+        for i in np.flatnonzero(~games.done):
+            action = ACTIONS[actions[i]]
+            if action not in states[i].getLegalActions(agentIndex):
+                raise Exception('Game %d turn %d: %s is not legal for agent %d' % (
+                    i, turn, action, agentIndex))
+            states[i] = states[i].generateSuccessor(agentIndex, action)
+            turns += 1
+        games.step(agentIndex, actions)
+        for i in range(numGames):
+            state = games.getState(i)
+            if not (state == states[i] and state.isWin() == states[i].isWin()
+                    and state.isLose() == states[i].isLose()):
+                raise Exception('Game %d differs from the rules after turn %d:\n%s\n%s' % (
+                    i, turn, state, states[i]))
+    return turns
@@ -223,6 +223,149 @@ class PriorityQueueWithFunction(PriorityQueue):
         PriorityQueue.push(self, item, self.priorityFunction(item))
 
 
+_REMOVED = object()     # marks a lazily removed IndexedPriorityQueue entry
+
+class IndexedPriorityQueue:
+    """
+    A priority queue of distinct items that keeps track of where each item
+    is, so that membership tests are O(1) and changing the priority of an
+    item is O(log n) instead of the linear scan of PriorityQueue.update.
+
+    Items must be hashable.  Ties between equal priorities go to the item
+    pushed first, as in PriorityQueue.
+
+    By default the queue is a binary heap with a map from each item to its
+    position in the heap.  With lazy=True it is a heapq heap instead, and an
+    entry whose priority changes is marked removed and pushed again; removed
+    entries are skipped when they come to the top, and cleared out whenever
+    they outnumber the items in the queue.
+    """
+    def  __init__(self, lazy=False):
+        self.lazy = lazy
+        self.heap = []          # entries [priority, count, item]
+        self.entries = {}       # item -> its entry
+        self.positions = {}     # item -> index of its entry in the heap
+        self.count = 0
+        self.removed = 0
+
+    def __contains__(self, item):
+        return item in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def isEmpty(self):
+        return len(self.entries) == 0
+
+    def getPriority(self, item):
+        return self.entries[item][0]
+
+    def push(self, item, priority):
+        """
+        Adds item to the queue.  If item is already in the queue, its
+        priority is replaced and it goes after the items that already have
+        the new priority, as if it had just been pushed.
+        """
+        if item in self.entries:
+            self.remove(item)
+        self._insert([priority, self.count, item])
+        self.count += 1
+
+    def pop(self):
+        "Removes and returns the item with the lowest priority"
+        if self.lazy:
+            entry = heapq.heappop(self.heap)
+            while entry[2] is _REMOVED:
+                self.removed -= 1
+                entry = heapq.heappop(self.heap)
+            item = entry[2]
+        else:
+            item = self.heap[0][2]
+            self._delete(0)
+        del self.entries[item]
+        return item
+
+    def update(self, item, priority):
+        """
+        The same as PriorityQueue.update: if item is in the queue with a
+        higher priority, its priority is lowered, keeping its place among
+        items of equal priority; if item is not in the queue it is pushed.
+        """
+        entry = self.entries.get(item)
+        if entry == None:
+            self.push(item, priority)
+        elif priority < entry[0]:
+            if self.lazy:
+                self.remove(item)
+                self._insert([priority, entry[1], item])
+            else:
+                entry[0] = priority
+                self._siftUp(self.positions[item])
+
+    def remove(self, item):
+        "Removes item from the queue"
+        entry = self.entries.pop(item)
+        if not self.lazy:
+            self._delete(self.positions[item])
+            return
+        entry[2] = _REMOVED
+        self.removed += 1
+        if self.removed > len(self.entries):
+            self.heap = [entry for entry in self.heap if entry[2] is not _REMOVED]
+            heapq.heapify(self.heap)
+            self.removed = 0
+
+    def _insert(self, entry):
+        self.entries[entry[2]] = entry
+        if self.lazy:
+            heapq.heappush(self.heap, entry)
+        else:
+            self.heap.append(entry)
+            self.positions[entry[2]] = len(self.heap) - 1
+            self._siftUp(len(self.heap) - 1)
+
+    def _delete(self, index):
+        # Removes the entry at index from the binary heap
+        heap = self.heap
+        del self.positions[heap[index][2]]
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            self.positions[last[2]] = index
+            self._siftUp(index)
+            self._siftDown(self.positions[last[2]])
+
+    def _siftUp(self, index):
+        heap, positions = self.heap, self.positions
+        entry = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[parent] <= entry:
+                break
+            heap[index] = heap[parent]
+            positions[heap[index][2]] = index
+            index = parent
+        heap[index] = entry
+        positions[entry[2]] = index
+
+    def _siftDown(self, index):
+        heap, positions = self.heap, self.positions
+        entry = heap[index]
+        size = len(heap)
+        child = 2 * index + 1
+        while child < size:
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry <= heap[child]:
+                break
+            heap[index] = heap[child]
+            positions[heap[index][2]] = index
+            index = child
+            child = 2 * index + 1
+        heap[index] = entry
+        positions[entry[2]] = index
+
+
 def manhattanDistance( xy1, xy2 ):
     "Returns the Manhattan distance between points xy1 and xy2"
     return abs( xy1[0] - xy2[0] ) + abs( xy1[1] - xy2[1] )
@@ -21,6 +21,8 @@
 # For more info, see http://inst.eecs.berkeley.edu/~cs188/sp09/pacman.html
 
 from util import *
+import operator
+import random
 import time, os
 import traceback
 import sys
@@ -67,18 +69,27 @@ class Directions:
                WEST: EAST,
                STOP: STOP}
 
-class Configuration:
+class Configuration(tuple):
     """
     A Configuration holds the (x,y) coordinate of a character, along with its
     traveling direction.
 
     The convention for positions, like a graph, is that (0,0) is the lower left corner, x increases
     horizontally and y increases vertically.  Therefore, north is the direction of increasing y, or (0,1).
+
+    Configurations are immutable (pos, direction) tuples, so they can be
+    shared freely between states; moving creates a new Configuration.
     """
+    __slots__ = ()
+
+    def __new__(cls, pos, direction):
+        return tuple.__new__(cls, (pos, direction))
 
-    def __init__(self, pos, direction):
-        self.pos = pos
-        self.direction = direction
+    def __getnewargs__(self):
+        return tuple(self)
+
+    pos = property(operator.itemgetter(0))
+    direction = property(operator.itemgetter(1))
 
     def getPosition(self):
         return (self.pos)
@@ -121,6 +132,8 @@ class AgentState:
     """
     AgentStates hold the state of an agent (configuration, speed, scared, etc).
     """
+    __slots__ = ('start', 'configuration', 'isPacman', 'scaredTimer',
+                 'numCarrying', 'numReturned')
 
     def __init__( self, startConfiguration, isPacman ):
         self.start = startConfiguration
@@ -274,11 +287,189 @@ class Grid:
                 bools.append(False)
         return bools
 
+class BitGrid:
+    """
+    A Grid of booleans backed by the bits of a single int, used for the walls
+    and food of a layout.  Cell (x,y) is bit x * height + y, which is the
+    order Grid walks its cells in, so hashes, asList() and packBits() agree
+    with a Grid holding the same values.
+
+    Data is still accessed via grid[x][y].  Copying a BitGrid copies one int,
+    hashing is cached until the grid changes and count() is a popcount.
+    Columns are materialized as lists only when they are first indexed.
+    """
+
+    def __init__(self, width, height, initialValue=False, bitRepresentation=None):
+        if initialValue not in [False, True]:
+            raise Exception('Grids can only contain booleans')
+        self.CELLS_PER_INT = 30
+
+        self.width = width
+        self.height = height
+        self.bits = (1 << (width * height)) - 1 if initialValue else 0
+        self._hash = None
+        self._columns = None
+        if bitRepresentation:
+            self._unpackBits(bitRepresentation)
+
+    def __getitem__(self, i):
+        columns = self._columns
+        if columns is None:
+            columns = self._columns = [None] * self.width
+        column = columns[i]
+        if column is None:
+            column = columns[i] = _BitGridColumn(self, i % self.width)
+        return column
+
+    def __setitem__(self, key, item):
+        column = self[key]
+        for y, value in enumerate(item):
+            column[y] = value
+
+    def __iter__(self):
+        return iter([self[x] for x in range(self.width)])
+
+    def __len__(self):
+        return self.width
+
+    def _setBit(self, x, y, value):
+        bit = 1 << (x * self.height + y)
+        if value:
+            self.bits |= bit
+        else:
+            self.bits &= ~bit
+        self._hash = None
+
+    @property
+    def data(self):
+        """
+        The grid as a list of lists, as stored by Grid.
+        """
+        return [list(column) for column in self]
+
+    def __str__(self):
+        out = [[str((self.bits >> (x * self.height + y)) & 1 == 1)[0]
+                for x in range(self.width)] for y in range(self.height)]
+        out.reverse()
+        return '\n'.join([''.join(x) for x in out])
+
+    def __eq__(self, other):
+        if other == None:
+            return False
+        if isinstance(other, BitGrid):
+            return (self.width == other.width and self.height == other.height
+                    and self.bits == other.bits)
+        return self.data == other.data
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self.bits)
+        return self._hash
+
+    def copy(self):
+        g = BitGrid.__new__(BitGrid)
+        g.CELLS_PER_INT = self.CELLS_PER_INT
+        g.width = self.width
+        g.height = self.height
+        g.bits = self.bits
+        g._hash = self._hash
+        g._columns = None
+        return g
+
+    def deepCopy(self):
+        return self.copy()
+
+    def shallowCopy(self):
+        # The bits are an immutable int, so a copy is already as cheap as
+        # sharing; unlike Grid, later writes are not visible to the original.
+        return self.copy()
+
+    def fromBits(width, height, bits):
+        """
+        Returns a BitGrid whose cell (x, y) is bit x * height + y of bits.
+        """
+        g = BitGrid(width, height)
+        g.bits = bits
+        return g
+    fromBits = staticmethod(fromBits)
+
+    def count(self, item=True):
+        numSet = bin(self.bits).count('1')
+        if item:
+            return numSet
+        return self.width * self.height - numSet
+
+    def asList(self, key=True):
+        bits = self.bits
+        if not key:
+            bits ^= (1 << (self.width * self.height)) - 1
+        list = []
+        height = self.height
+        while bits:
+            lowest = bits & -bits
+            list.append(divmod(lowest.bit_length() - 1, height))
+            bits ^= lowest
+        return list
+
+    def packBits(self):
+        """
+        Returns an efficient int list representation
+
+        (width, height, bitPackedInts...)
+        """
+        bits = [self.width, self.height]
+        numCells = self.width * self.height
+        for start in range(0, numCells, self.CELLS_PER_INT):
+            currentInt = 0
+            for i in range(start, start + self.CELLS_PER_INT):
+                currentInt <<= 1
+                if i < numCells and (self.bits >> i) & 1:
+                    currentInt |= 1
+            bits.append(currentInt)
+        if numCells % self.CELLS_PER_INT == 0:
+            bits.append(0)
+        return tuple(bits)
+
+    def _unpackBits(self, bits):
+        """
+        Fills in data from a bit-level representation
+        """
+        numCells = self.width * self.height
+        cell = 0
+        self.bits = 0
+        for packed in bits:
+            if packed < 0:
+                raise ValueError("must be a positive integer")
+            for i in range(self.CELLS_PER_INT):
+                if cell == numCells:
+                    break
+                if (packed >> (self.CELLS_PER_INT - i - 1)) & 1:
+                    self.bits |= 1 << cell
+                cell += 1
+        self._hash = None
+        self._columns = None
+
+class _BitGridColumn(list):
+    """
+    A column of a BitGrid.  Reads are plain list reads; writes also update
+    the bits of the grid the column belongs to.
+    """
+
+    def __init__(self, grid, x):
+        bits = grid.bits >> (x * grid.height)
+        list.__init__(self, [(bits >> y) & 1 == 1 for y in range(grid.height)])
+        self.grid = grid
+        self.x = x
+
+    def __setitem__(self, y, value):
+        list.__setitem__(self, y, value)
+        self.grid._setBit(self.x, y % self.grid.height, value)
+
 def reconstituteGrid(bitRep):
     if type(bitRep) is not type((1,2)):
         return bitRep
     width, height = bitRep[:2]
-    return Grid(width, height, bitRepresentation= bitRep[2:])
+    return BitGrid(width, height, bitRepresentation= bitRep[2:])
 
 ####################################
 # Parts you shouldn't have to read #
@@ -348,7 +539,16 @@ class Actions:
 
     getPossibleActions = staticmethod(getPossibleActions)
 
-    def getLegalNeighbors(position, walls):
+    def getLegalNeighbors(position, walls, legalNeighbors=None):
+        """
+        Returns the cells next to position that are not walls.  Given the
+        legalNeighbors table of the Layout these walls belong to, the cells
+        it covers are looked up rather than checked.
+        """
+        if legalNeighbors is not None:
+            neighbors = legalNeighbors.get(position)
+            if neighbors is not None:
+                return list(neighbors)
         x,y = position
         x_int, y_int = int(x + 0.5), int(y + 0.5)
         neighbors = []
@@ -368,10 +568,38 @@ class Actions:
         return (x + dx, y + dy)
     getSuccessor = staticmethod(getSuccessor)
 
+class ZobristKeys:
+    """
+    Random 64-bit keys for Zobrist hashing, generated on demand from a fixed
+    seed so that every process uses the same keys.
+    """
+    def __init__( self, seed ):
+        self.keys = []
+        self.random = random.Random(seed)
+
+    def __getitem__( self, index ):
+        while len( self.keys ) <= index:
+            self.keys.append( self.random.getrandbits(64) )
+        return self.keys[index]
+
+# Keys for food and capsules, and for the position, direction and scared
+# timer of each agent; see GameStateData._agentKey
+ZOBRIST_KEYS = ZobristKeys(188)
+AGENT_POSITION_KEYS = ZobristKeys(189)
+AGENT_DIRECTION_KEYS = ZobristKeys(190)
+AGENT_TIMER_KEYS = ZobristKeys(191)
+DIRECTION_NUMBERS = {Directions.NORTH: 0, Directions.SOUTH: 1, Directions.EAST: 2,
+                     Directions.WEST: 3, Directions.STOP: 4}
+
 class GameStateData:
     """
 
     """
+    # Search trees hold a great many of these, so they carry no __dict__
+    __slots__ = ('food', 'capsules', 'agentStates', 'layout', '_eaten', 'score',
+                 '_zobrist', '_unhashedAgents', '_foodEaten', '_foodAdded',
+                 '_capsuleEaten', '_agentMoved', '_lose', '_win', 'scoreChange')
+
     def __init__( self, prevState = None ):
         """
         Generates a new data packet by copying information from its predecessor.
@@ -383,6 +611,8 @@ class GameStateData:
             self.layout = prevState.layout
             self._eaten = prevState._eaten
             self.score = prevState.score
+            self._zobrist = prevState._zobrist
+            self._unhashedAgents = prevState._unhashedAgents
 
         self._foodEaten = None
         self._foodAdded = None
@@ -402,12 +632,78 @@ class GameStateData:
         state._capsuleEaten = self._capsuleEaten
         return state
 
+    def snapshot( self ):
+        """
+        Returns a copy of this data as deepCopy does, but sharing the layout,
+        which never changes during a game, instead of rebuilding it.
+        """
+        state = GameStateData( self )
+        state._agentMoved = self._agentMoved
+        state._foodEaten = self._foodEaten
+        state._foodAdded = self._foodAdded
+        state._capsuleEaten = self._capsuleEaten
+        return state
+
     def copyAgentStates( self, agentStates ):
         copiedStates = []
         for agentState in agentStates:
             copiedStates.append( agentState.copy() )
         return copiedStates
 
+    def getMutableAgentState( self, agentIndex ):
+        """
+        Returns the AgentState for agentIndex so that the rules can modify it.
+
+        The agent's key is taken out of the incremental hash here and put
+        back, from its modified state, the next time the hash is needed.
+        """
+        if not (self._unhashedAgents >> agentIndex) & 1:
+            self._zobrist ^= self._agentKey( agentIndex )
+            self._unhashedAgents |= 1 << agentIndex
+        return self.agentStates[agentIndex]
+
+    def _agentKey( self, agentIndex ):
+        """
+        Returns the Zobrist key of an agent's position, direction and scared
+        timer.  Agents can stop between cells, so positions are numbered by
+        half cell.
+        """
+        agentState = self.agentStates[agentIndex]
+        configuration = agentState.configuration
+        numAgents = len( self.agentStates )
+        x, y = configuration.pos
+        position = int( round(2 * x) ) * 2 * self.layout.height + int( round(2 * y) )
+        direction = DIRECTION_NUMBERS[configuration.direction]
+        return ( AGENT_POSITION_KEYS[position * numAgents + agentIndex]
+                 ^ AGENT_DIRECTION_KEYS[direction * numAgents + agentIndex]
+                 ^ AGENT_TIMER_KEYS[agentState.scaredTimer * numAgents + agentIndex] )
+
+    def toggleFoodHash( self, position ):
+        """
+        Updates the incremental hash for food appearing at or disappearing
+        from position.
+        """
+        x, y = position
+        self._zobrist ^= ZOBRIST_KEYS[2 * (x * self.layout.height + y)]
+
+    def toggleCapsuleHash( self, position ):
+        """
+        Updates the incremental hash for a capsule appearing at or
+        disappearing from position.
+        """
+        x, y = position
+        self._zobrist ^= ZOBRIST_KEYS[2 * (x * self.layout.height + y) + 1]
+
+    def _computeZobrist( self ):
+        self._zobrist = 0
+        self._unhashedAgents = 0
+        for position in self.food.asList():
+            self.toggleFoodHash( position )
+        for position in self.capsules:
+            self.toggleCapsuleHash( position )
+        for agentIndex in range( len( self.agentStates ) ):
+            self._zobrist ^= self._agentKey( agentIndex )
+
     def __eq__( self, other ):
         """
         Allows two states to be compared.
@@ -423,14 +719,16 @@ class GameStateData:
     def __hash__( self ):
         """
         Allows states to be keys of dictionaries.
+
+        Agents, food and capsules are covered by a Zobrist hash that the
+        rules update incrementally, so a successor's hash costs O(1).
         """
-        for i, state in enumerate( self.agentStates ):
-            try:
-                int(hash(state))
-            except TypeError as e:
-                print(e)
-                #hash(state)
-        return int((hash(tuple(self.agentStates)) + 13*hash(self.food) + 113* hash(tuple(self.capsules)) + 7 * hash(self.score)) % 1048575 )
+        if self._unhashedAgents:
+            for agentIndex in range( len( self.agentStates ) ):
+                if (self._unhashedAgents >> agentIndex) & 1:
+                    self._zobrist ^= self._agentKey( agentIndex )
+            self._unhashedAgents = 0
+        return hash( (self._zobrist, self.score) )
 
     def __str__( self ):
         width, height = self.layout.width, self.layout.height
@@ -503,6 +801,7 @@ class GameStateData:
                 else: numGhosts += 1
             self.agentStates.append( AgentState( Configuration( pos, Directions.STOP), isPacman) )
         self._eaten = [False for a in self.agentStates]
+        self._computeZobrist()
 
 try:
     import boinc
@@ -515,7 +814,16 @@ class Game:
     The Game manages the control flow, soliciting actions from agents.
     """
 
-    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False ):
+    def __init__( self, agents, display, rules, startingIndex=0, muteAgents=False, catchExceptions=False, deadlineMode=None,
+                  strictObservations=False ):
+        """
+        With catchExceptions, agent calls are held to the rules' time limits
+        by util.callWithDeadline in deadlineMode (one of util.DEADLINE_MODES;
+        by default signal timers where available).
+
+        Agents observe snapshots of the game state that share its layout;
+        with strictObservations they are given deep copies instead.
+        """
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -524,7 +832,13 @@ class Game:
         self.gameOver = False
         self.muteAgents = muteAgents
         self.catchExceptions = catchExceptions
+        self.deadlineMode = deadlineMode
+        self.strictObservations = strictObservations
         self.moveHistory = []
+        # Set to a replay.ReplayWriter to stream the moves to a file
+        self.replayWriter = None
+        # Set to a gameProfiler.GameProfiler to time the phases of the game
+        self.profiler = None
         self.totalAgentTimes = [0 for agent in agents]
         self.totalAgentTimeWarnings = [0 for agent in agents]
         self.agentTimeout = False
@@ -544,6 +858,16 @@ class Game:
         self.agentCrashed = True
         self.rules.agentCrash(self, agentIndex)
 
+    def _passOnOuterDeadline(self, exception):
+        """
+        Raises exception again if it is for a deadline the game itself runs
+        under, such as a grader's limit, rather than one the game gave an
+        agent, so that the agent is not charged with it.
+        """
+        if exceededOuterDeadline(exception):
+            self.unmute()
+            raise exception
+
     OLD_STDOUT = None
     OLD_STDERR = None
 
@@ -564,10 +888,25 @@ class Game:
         sys.stderr = OLD_STDERR
 
 
+    def observeState( self ):
+        """
+        Returns the copy of the current state that an agent is given.
+        """
+        if self.strictObservations:
+            return self.state.deepCopy()
+        return self.state.snapshot()
+
     def run( self ):
         """
         Main control loop for game play.
         """
+        if self.profiler == None: return self._run()
+        self.profiler.startGame(self)
+        try: self._run()
+        finally: self.profiler.endGame(self)
+
+    def _run( self ):
+        profiler = self.profiler
         self.display.initialize(self.state.data)
         self.numMoves = 0
 
@@ -585,26 +924,30 @@ class Game:
                 return
             if ("registerInitialState" in dir(agent)):
                 self.mute(i)
+                if profiler != None: profiler.begin()
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.registerInitialState, int(self.rules.getMaxStartupTime(i)))
                         try:
                             start_time = time.time()
-                            timed_func(self.state.deepCopy())
+                            callWithDeadline(agent.registerInitialState, self.rules.getMaxStartupTime(i) * 1000,
+                                             (self.observeState(),), mode=self.deadlineMode)
                             time_taken = time.time() - start_time
                             self.totalAgentTimes[i] += time_taken
-                        except TimeoutFunctionException:
+                        except TimeoutFunctionException as timeout:
+                            self._passOnOuterDeadline( timeout )
                             print("Agent %d ran out of time on startup!" % i, file=sys.stderr)
                             self.unmute()
                             self.agentTimeout = True
                             self._agentCrash(i, quiet=True)
                             return
                     except Exception as data:
+                        self._passOnOuterDeadline( data )
                         self._agentCrash(i, quiet=False)
                         self.unmute()
                         return
                 else:
-                    agent.registerInitialState(self.state.deepCopy())
+                    agent.registerInitialState(self.observeState())
+                if profiler != None: profiler.end(i, 'registerInitialState')
                 ## TODO: could this exceed the total time
                 self.unmute()
 
@@ -616,41 +959,48 @@ class Game:
             agent = self.agents[agentIndex]
             move_time = 0
             skip_action = False
+            if profiler != None: profiler.begin()
             # Generate an observation of the state
             if 'observationFunction' in dir( agent ):
                 self.mute(agentIndex)
                 if self.catchExceptions:
                     try:
-                        timed_func = TimeoutFunction(agent.observationFunction, int(self.rules.getMoveTimeout(agentIndex)))
                         try:
                             start_time = time.time()
-                            observation = timed_func(self.state.deepCopy())
-                        except TimeoutFunctionException:
+                            observation = callWithDeadline(agent.observationFunction, self.rules.getMoveTimeout(agentIndex) * 1000,
+                                                           (self.observeState(),), mode=self.deadlineMode)
+                        except TimeoutFunctionException as timeout:
+                            self._passOnOuterDeadline( timeout )
                             skip_action = True
                         move_time += time.time() - start_time
                         self.unmute()
                     except Exception as data:
+                        self._passOnOuterDeadline( data )
                         self._agentCrash(agentIndex, quiet=False)
                         self.unmute()
                         return
                 else:
-                    observation = agent.observationFunction(self.state.deepCopy())
+                    observation = agent.observationFunction(self.observeState())
                 self.unmute()
             else:
-                observation = self.state.deepCopy()
+                observation = self.observeState()
+            if profiler != None:
+                profiler.end(agentIndex, 'observe')
+                profiler.begin()
 
             # Solicit an action
             action = None
             self.mute(agentIndex)
             if self.catchExceptions:
                 try:
-                    timed_func = TimeoutFunction(agent.getAction, int(self.rules.getMoveTimeout(agentIndex)) - int(move_time))
                     try:
                         start_time = time.time()
                         if skip_action:
                             raise TimeoutFunctionException()
-                        action = timed_func( observation )
-                    except TimeoutFunctionException:
+                        action = callWithDeadline(agent.getAction, (self.rules.getMoveTimeout(agentIndex) - move_time) * 1000,
+                                                  (observation,), mode=self.deadlineMode)
+                    except TimeoutFunctionException as timeout:
+                        self._passOnOuterDeadline( timeout )
                         print("Agent %d timed out on a single move!" % agentIndex, file=sys.stderr)
                         self.agentTimeout = True
                         self._agentCrash(agentIndex, quiet=True)
@@ -679,12 +1029,16 @@ class Game:
                         return
                     self.unmute()
                 except Exception as data:
+                    self._passOnOuterDeadline( data )
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
             else:
                 action = agent.getAction(observation)
             self.unmute()
+            if profiler != None:
+                profiler.end(agentIndex, 'getAction')
+                profiler.begin()
 
             # Execute the action
             self.moveHistory.append( (agentIndex, action) )
@@ -692,20 +1046,29 @@ class Game:
                 try:
                     self.state = self.state.generateSuccessor( agentIndex, action )
                 except Exception as data:
+                    self._passOnOuterDeadline( data )
                     self.mute(agentIndex)
                     self._agentCrash(agentIndex)
                     self.unmute()
                     return
             else:
                 self.state = self.state.generateSuccessor( agentIndex, action )
+            if profiler != None: profiler.end(agentIndex, 'generateSuccessor')
+            if self.replayWriter != None:
+                self.replayWriter.recordMove( action, self.state )
 
             # Change the display
+            if profiler != None: profiler.begin()
             self.display.update( self.state.data )
             ###idx = agentIndex - agentIndex % 2 + 1
             ###self.display.update( self.state.makeObservation(idx).data )
+            if profiler != None:
+                profiler.end(agentIndex, 'display')
+                profiler.begin()
 
             # Allow for game specific conditions (winning, losing, etc.)
             self.rules.process(self.state, self)
+            if profiler != None: profiler.end(agentIndex, 'process')
             # Track progress
             if agentIndex == numAgents + 1: self.numMoves += 1
             # Next agent
@@ -719,9 +1082,12 @@ class Game:
             if "final" in dir( agent ) :
                 try:
                     self.mute(agentIndex)
+                    if profiler != None: profiler.begin()
                     agent.final( self.state )
+                    if profiler != None: profiler.end(agentIndex, 'final')
                     self.unmute()
                 except Exception as data:
+                    self._passOnOuterDeadline( data )
                     if not self.catchExceptions: raise data
                     self._agentCrash(agentIndex)
                     self.unmute()
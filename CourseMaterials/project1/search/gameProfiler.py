@@ -0,0 +1,220 @@
+# gameProfiler.py
+# ---------------
+# Licensing Information:  You are free to use or extend these projects for
+# educational purposes provided that (1) you do not distribute or publish
+# solutions, (2) you retain this notice, and (3) you provide clear
+# attribution to UC Berkeley, including a link to http://ai.berkeley.edu.
+#
+# Attribution Information: The Pacman AI projects were developed at UC Berkeley.
+# The core projects and autograders were primarily created by John DeNero
+# (denero@cs.berkeley.edu) and Dan Klein (klein@cs.berkeley.edu).
+# Student side autograding was added by Brad Miller, Nick Hay, and
+# Pieter Abbeel (pabbeel@cs.berkeley.edu).
+
+
+"""
+Profiling for games, to show where their time goes.
+
+Give a GameProfiler to a Game as its profiler and Game.run times each
+phase of the game for each agent:
+
+  registerInitialState   the agent's setup
+  observe                copying the state for the agent and its
+                         observationFunction
+  getAction              the agent choosing its move
+  generateSuccessor      the game applying the move
+  display                updating the display
+  process                the rules checking for the end of the game
+  final                  the agent's final
+
+From the command line, pacman.py --profile prints a summary after the games
+and --profileTrace writes each phase of each move to a file that Chrome's
+about://tracing, Perfetto or speedscope can show as a flame chart.
+
+testGameProfiler.py tests it.
+"""
+
+import json
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # not available on some Python implementations
+    tracemalloc = None
+
+PHASES = ['registerInitialState', 'observe', 'getAction', 'generateSuccessor',
+          'display', 'process', 'final']
+
+
+class GameProfiler:
+    """
+    Totals the wall and CPU time of each phase of Game.run per agent, over
+    every game it is given to.
+
+    With countSuccessors, the states generated during each phase are counted
+    too, through the exploration recorder of the game's state class.  With
+    traceAllocations, the peak memory allocated during each phase is
+    measured with tracemalloc, which slows the game down considerably.  With
+    traceMoves, every phase is also kept as an event for writeTrace.
+    """
+
+    def __init__(self, countSuccessors=False, traceAllocations=False, traceMoves=False):
+        self.countSuccessors = countSuccessors
+        self.traceAllocations = traceAllocations and tracemalloc != None
+        self.traceMoves = traceMoves
+        self.numGames = 0
+        self.turn = 0
+        # (agentIndex, phase) -> [calls, wall, cpu, successors, allocated]
+        self.totals = {}
+        # (phase, agentIndex, game, turn, start, duration), in seconds
+        self.events = []
+        self.generated = 0
+        self.previousRecorder = None
+        self.startTime = time.perf_counter()
+
+    def spawn(self):
+        """
+        Returns an empty profiler with the same settings, whose results can
+        later be added to this one with merge.
+        """
+        return GameProfiler(self.countSuccessors, self.traceAllocations, self.traceMoves)
+
+    def startGame(self, game):
+        """
+        Called by Game.run before the game starts.
+        """
+        self.numGames += 1
+        self.turn = 0
+        if self.countSuccessors:
+            self.stateClass = type(game.state)
+            if hasattr(self.stateClass, 'setExplorationRecorder'):
+                self.previousRecorder = self.stateClass.setExplorationRecorder(self)
+            else:
+                self.stateClass = None
+        if self.traceAllocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def endGame(self, game):
+        """
+        Called by Game.run once the game is over, however it ended.
+        """
+        if self.countSuccessors and self.stateClass != None:
+            self.stateClass.setExplorationRecorder(self.previousRecorder)
+            self.previousRecorder = None
+
+    def begin(self):
+        """
+        Starts timing a phase, which end names.
+        """
+        if self.traceAllocations:
+            tracemalloc.reset_peak()
+            self.beginMemory = tracemalloc.get_traced_memory()[0]
+        self.beginGenerated = self.generated
+        self.beginCpu = time.process_time()
+        self.beginWall = time.perf_counter()
+
+    def end(self, agentIndex, phase):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        key = (agentIndex, phase)
+        totals = self.totals.get(key)
+        if totals == None:
+            totals = self.totals[key] = [0, 0.0, 0.0, 0, 0]
+        totals[0] += 1
+        totals[1] += wall - self.beginWall
+        totals[2] += cpu - self.beginCpu
+        totals[3] += self.generated - self.beginGenerated
+        if self.traceAllocations:
+            totals[4] += tracemalloc.get_traced_memory()[1] - self.beginMemory
+        if self.traceMoves:
+            self.events.append((phase, agentIndex, self.numGames, self.turn,
+                                self.beginWall - self.startTime, wall - self.beginWall))
+        if phase == 'process':
+            self.turn += 1
+
+    # The exploration recorder interface, passed on to the recorder that was
+    # installed before the game started
+
+    def record(self, parent, child):
+        self.generated += 1
+        if self.previousRecorder != None:
+            self.previousRecorder.record(parent, child)
+
+    def count(self):
+        if self.previousRecorder != None:
+            return self.previousRecorder.count()
+        return 0
+
+    def getExplored(self):
+        if self.previousRecorder != None:
+            return self.previousRecorder.getExplored()
+        return set()
+
+    def reset(self):
+        if self.previousRecorder != None:
+            self.previousRecorder.reset()
+
+    def merge(self, other):
+        """
+        Adds the results of other, a profiler from spawn, to this one.
+        """
+        for key, totals in other.totals.items():
+            mine = self.totals.setdefault(key, [0, 0.0, 0.0, 0, 0])
+            for i in range(len(mine)):
+                mine[i] += totals[i]
+        offset = self.numGames
+        self.events.extend([(phase, agentIndex, game + offset, turn, start, duration)
+                            for phase, agentIndex, game, turn, start, duration in other.events])
+        self.numGames += other.numGames
+
+    def getSummary(self):
+        """
+        Returns the results as a dict: the number of games, and for each
+        agent and phase the number of calls, wall and CPU seconds, states
+        generated and bytes allocated.
+        """
+        phases = []
+        for (agentIndex, phase), totals in sorted(self.totals.items(),
+                                                  key=lambda item: (item[0][0], PHASES.index(item[0][1]))):
+            calls, wall, cpu, successors, allocated = totals
+            summary = {'agent': agentIndex, 'phase': phase, 'calls': calls, 'wall': wall, 'cpu': cpu}
+            if self.countSuccessors:
+                summary['successors'] = successors
+            if self.traceAllocations:
+                summary['allocated'] = allocated
+            phases.append(summary)
+        return {'games': self.numGames,
+                'wall': sum([phase['wall'] for phase in phases]),
+                'phases': phases}
+
+    def printSummary(self, out=None):
+        if out == None:
+            out = sys.stdout
+        summary = self.getSummary()
+        columns = ['calls', 'wall', 'cpu', 'successors', 'allocated']
+        columns = [column for column in columns if column in summary['phases'][0]] if summary['phases'] else []
+        print('Profile of %d game(s), %.2f seconds' % (summary['games'], summary['wall']), file=out)
+        print('%-6s %-22s' % ('Agent', 'Phase') + ''.join(['%12s' % column for column in columns]) + '%8s' % 'share',
+              file=out)
+        for phase in summary['phases']:
+            cells = [('%12.4f' if column in ('wall', 'cpu') else '%12d') % phase[column] for column in columns]
+            share = 100.0 * phase['wall'] / summary['wall'] if summary['wall'] > 0 else 0.0
+            print('%-6d %-22s' % (phase['agent'], phase['phase']) + ''.join(cells) + '%7.1f%%' % share, file=out)
+
+    def writeTrace(self, path):
+        """
+        Writes the phases kept with traceMoves to path in the Trace Event
+        Format: one complete event per phase, with each game as a process
+        and each agent as a thread.
+        """
+        events = []
+        for phase, agentIndex, game, turn, start, duration in self.events:
+            events.append({'name': phase, 'cat': 'game', 'ph': 'X',
+                           'ts': start * 1e6, 'dur': duration * 1e6,
+                           'pid': game, 'tid': agentIndex, 'args': {'turn': turn}})
+        f = open(path, 'w')
+        try:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        finally:
+            f.close()
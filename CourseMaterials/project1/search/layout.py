@@ -14,11 +14,127 @@
 
 from util import manhattanDistance
 from game import Grid
+from game import BitGrid
+import json
 import os
 import random
-from functools import reduce
+import sys
+from collections import OrderedDict
 
-VISIBILITY_MATRIX_CACHE = {}
+# Caches keyed by layout text, which evict the least recently used layout
+# once they are full; see getCached and putCached
+# Layout text -> VisibilityMatrix
+VISIBILITY_MATRIX_CACHE = OrderedDict()
+VISIBILITY_MATRIX_CACHE_SIZE = 32
+# Layout text -> the tables of Layout.initializeMoveTables
+MOVE_TABLE_CACHE = OrderedDict()
+MOVE_TABLE_CACHE_SIZE = 128
+# Layout text -> its walls, food, capsules, agent positions and ghost count
+LAYOUT_CACHE = OrderedDict()
+LAYOUT_CACHE_SIZE = 128
+# Resolved path of a layout file -> (its size and modification time, its text)
+LAYOUT_FILE_CACHE = OrderedDict()
+LAYOUT_FILE_CACHE_SIZE = 128
+
+# A pre-parsed index of the layouts in a directory; see buildLayoutIndex
+LAYOUT_INDEX_NAME = 'layouts.json'
+LAYOUT_INDEX_VERSION = 3
+
+def getCached(cache, key):
+    """
+    Returns the value of key in one of the caches above, or None if it is
+    not there, and marks it as the most recently used.
+    """
+    value = cache.get(key)
+    if value != None:
+        cache.move_to_end(key)
+    return value
+
+def putCached(cache, key, value, size):
+    """
+    Stores value under key in one of the caches above, evicting the least
+    recently used values beyond size.
+    """
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > size:
+        cache.popitem(last=False)
+
+class VisibilityMatrix:
+    """
+    The positions that can be seen from each open cell looking in each
+    direction: the whole and half cells along the way up to the first wall.
+
+    The positions seen from a cell are held as a bitset over half cells,
+    where position (x, y) is bit 2x * 2height + 2y.  A ray from a cell is
+    the ray from its neighbor plus the step between them, so each direction
+    is computed in one pass over the grid, the first time it is asked for.
+    """
+
+    def __init__(self, walls):
+        self.walls = walls.copy()
+        self.width = walls.width
+        self.height = walls.height
+        self.rays = {}
+
+    def getRays(self, direction):
+        """
+        Returns the bitsets of the positions seen looking in direction,
+        indexed by x * height + y.
+        """
+        if direction not in self.rays:
+            from game import Actions
+            dx, dy = [int(v) for v in Actions.directionToVector(direction)]
+            width, height, walls = self.width, self.height, self.walls
+            rays = [0] * (width * height)
+            if (dx, dy) != (0, 0):
+                # Visit each cell after the neighbor it looks towards
+                xs = range(width - 1, -1, -1) if dx > 0 else range(width)
+                ys = range(height - 1, -1, -1) if dy > 0 else range(height)
+                for x in xs:
+                    for y in ys:
+                        if walls[x][y]:
+                            continue
+                        halfX, halfY = 2 * x + dx, 2 * y + dy
+                        ray = 0
+                        if halfX >= 0 and halfY >= 0:
+                            ray = 1 << (halfX * 2 * height + halfY)
+                        nextX, nextY = x + dx, y + dy
+                        if 0 <= nextX < width and 0 <= nextY < height and not walls[nextX][nextY]:
+                            ray |= (1 << (2 * nextX * 2 * height + 2 * nextY)) | rays[nextX * height + nextY]
+                        rays[x * height + y] = ray
+            self.rays[direction] = rays
+        return self.rays[direction]
+
+    def isVisible(self, position, direction, target):
+        """
+        Returns whether target can be seen from the cell at position looking
+        in direction.
+        """
+        x, y = position
+        halfX, halfY = 2 * target[0], 2 * target[1]
+        if halfX != int(halfX) or halfY != int(halfY):
+            return False
+        halfX, halfY = int(halfX), int(halfY)
+        if not (0 <= halfX < 2 * self.width and 0 <= halfY < 2 * self.height):
+            return False
+        return (self.getRays(direction)[x * self.height + y] >> (halfX * 2 * self.height + halfY)) & 1 == 1
+
+    def getVisiblePositions(self, position, direction):
+        """
+        Returns the positions that can be seen from the cell at position
+        looking in direction, nearest first.
+        """
+        x, y = position
+        ray = self.getRays(direction)[x * self.height + y]
+        positions = []
+        while ray:
+            lowest = ray & -ray
+            halfX, halfY = divmod(lowest.bit_length() - 1, 2 * self.height)
+            positions.append((halfX / 2.0, halfY / 2.0))
+            ray ^= lowest
+        positions.sort(key=lambda p: abs(p[0] - x) + abs(p[1] - y))
+        return positions
 
 class Layout:
     """
@@ -28,39 +144,84 @@ class Layout:
     def __init__(self, layoutText):
         self.width = len(layoutText[0])
         self.height= len(layoutText)
-        self.walls = Grid(self.width, self.height, False)
-        self.food = Grid(self.width, self.height, False)
+        self.walls = BitGrid(self.width, self.height, False)
+        self.food = BitGrid(self.width, self.height, False)
         self.capsules = []
         self.agentPositions = []
         self.numGhosts = 0
-        self.processLayoutText(layoutText)
+        # Layouts with the same text are parsed once per process
+        key = '\n'.join(layoutText)
+        parsed = getCached(LAYOUT_CACHE, key)
+        if parsed == None:
+            self.processLayoutText(layoutText)
+            putCached(LAYOUT_CACHE, key, (self.walls.copy(), self.food.copy(), tuple(self.capsules),
+                                          tuple(self.agentPositions), self.numGhosts), LAYOUT_CACHE_SIZE)
+        else:
+            walls, food, capsules, agentPositions, self.numGhosts = parsed
+            self.walls = walls.copy()
+            self.food = food.copy()
+            self.capsules = list(capsules)
+            self.agentPositions = list(agentPositions)
         self.layoutText = layoutText
-        self.totalFood = len(self.food.asList())
-        # self.initializeVisibilityMatrix()
+        self.totalFood = self.food.count()
+        self.initializeMoveTables()
+        self.visibility = None  # Set when first needed
 
     def getNumGhosts(self):
         return self.numGhosts
 
     def initializeVisibilityMatrix(self):
-        global VISIBILITY_MATRIX_CACHE
-        if reduce(str.__add__, self.layoutText) not in VISIBILITY_MATRIX_CACHE:
-            from game import Directions
-            vecs = [(-0.5,0), (0.5,0),(0,-0.5),(0,0.5)]
-            dirs = [Directions.NORTH, Directions.SOUTH, Directions.WEST, Directions.EAST]
-            vis = Grid(self.width, self.height, {Directions.NORTH:set(), Directions.SOUTH:set(), Directions.EAST:set(), Directions.WEST:set(), Directions.STOP:set()})
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.walls[x][y] == False:
-                        for vec, direction in zip(vecs, dirs):
-                            dx, dy = vec
-                            nextx, nexty = x + dx, y + dy
-                            while (nextx + nexty) != int(nextx) + int(nexty) or not self.walls[int(nextx)][int(nexty)] :
-                                vis[x][y][direction].add((nextx, nexty))
-                                nextx, nexty = x + dx, y + dy
-            self.visibility = vis
-            VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)] = vis
-        else:
-            self.visibility = VISIBILITY_MATRIX_CACHE[reduce(str.__add__, self.layoutText)]
+        """
+        Sets self.visibility to the VisibilityMatrix of this layout, shared
+        with the other layouts with the same text.
+        """
+        key = str(self)
+        visibility = getCached(VISIBILITY_MATRIX_CACHE, key)
+        if visibility == None:
+            visibility = VisibilityMatrix(self.walls)
+            putCached(VISIBILITY_MATRIX_CACHE, key, visibility, VISIBILITY_MATRIX_CACHE_SIZE)
+        self.visibility = visibility
+
+    def initializeMoveTables(self):
+        """
+        Precomputes the moves available from each open cell, since the walls
+        never change during a game:
+
+          legalActions[(x, y)]              the actions Pacman may take
+          ghostActions[(x, y)][direction]   the actions a ghost that is
+                                            facing direction may take
+          legalNeighbors[(x, y)]            the cells that can be moved to
+
+        The tables hold tuples and are shared by every layout with the same
+        text.  Cells on the edge of the board are left out, as are positions
+        between cells, so lookups for those fall back to the wall checks.
+        legalNeighbors is given to Actions.getLegalNeighbors by callers that
+        hold the layout.
+        """
+        from game import Actions, Configuration, Directions
+        key = str(self)
+        moveTables = getCached(MOVE_TABLE_CACHE, key)
+        if moveTables == None:
+            legalActions, ghostActions, legalNeighbors = {}, {}, {}
+            for x in range(1, self.width - 1):
+                for y in range(1, self.height - 1):
+                    if self.walls[x][y]:
+                        continue
+                    actions = Actions.getPossibleActions(
+                        Configuration((x, y), Directions.STOP), self.walls)
+                    legalActions[(x, y)] = tuple(actions)
+                    ghostActions[(x, y)] = {}
+                    for direction in Actions._directions:
+                        possible = [a for a in actions if a != Directions.STOP]
+                        reverse = Actions.reverseDirection(direction)
+                        if reverse in possible and len(possible) > 1:
+                            possible.remove(reverse)
+                        ghostActions[(x, y)][direction] = tuple(possible)
+                    legalNeighbors[(x, y)] = tuple(
+                        Actions.getLegalNeighbors((x, y), self.walls))
+            moveTables = (legalActions, ghostActions, legalNeighbors)
+            putCached(MOVE_TABLE_CACHE, key, moveTables, MOVE_TABLE_CACHE_SIZE)
+        self.legalActions, self.ghostActions, self.legalNeighbors = moveTables
 
     def isWall(self, pos):
         x, col = pos
@@ -84,8 +245,10 @@ class Layout:
         return pos
 
     def isVisibleFrom(self, ghostPos, pacPos, pacDirection):
+        if self.visibility == None:
+            self.initializeVisibilityMatrix()
         row, col = [int(x) for x in pacPos]
-        return ghostPos in self.visibility[row][col][pacDirection]
+        return self.visibility.isVisible((row, col), pacDirection, ghostPos)
 
     def __str__(self):
         return "\n".join(self.layoutText)
@@ -130,21 +293,121 @@ class Layout:
             self.agentPositions.append( (int(layoutChar), (x,y)))
             self.numGhosts += 1
 def getLayout(name, back = 2):
-    if name.endswith('.lay'):
-        layout = tryToLoad('layouts/' + name)
-        if layout == None: layout = tryToLoad(name)
-    else:
-        layout = tryToLoad('layouts/' + name + '.lay')
-        if layout == None: layout = tryToLoad(name + '.lay')
-    if layout == None and back >= 0:
-        curdir = os.path.abspath('.')
-        os.chdir('..')
-        layout = getLayout(name, back -1)
-        os.chdir(curdir)
-    return layout
+    """
+    Loads the layout called name from layouts/ or the current directory, or
+    failing that from those of up to back + 1 directories above it.
+    """
+    if not name.endswith('.lay'): name += '.lay'
+    directory = os.path.abspath('.')
+    for i in range(back + 2):
+        layout = tryToLoad(os.path.join(directory, 'layouts', name))
+        if layout == None: layout = tryToLoad(os.path.join(directory, name))
+        if layout != None: return layout
+        directory = os.path.dirname(directory)
+    return None
 
 def tryToLoad(fullname):
-    if(not os.path.exists(fullname)): return None
-    f = open(fullname)
-    try: return Layout([line.strip() for line in f])
+    layoutText = readLayoutText(fullname)
+    if layoutText == None: return None
+    return Layout(layoutText)
+
+def readLayoutText(fullname):
+    """
+    Returns the lines of the layout file fullname, or None if there is no
+    such file.  Files are read once per process unless they change.
+    """
+    path = os.path.realpath(fullname)
+    try: stat = os.stat(path)
+    except OSError: return None
+    signature = (stat.st_size, stat.st_mtime_ns)
+    cached = getCached(LAYOUT_FILE_CACHE, path)
+    if cached == None or cached[0] != signature:
+        f = open(path)
+        try: cached = (signature, tuple([line.strip() for line in f]))
+        finally: f.close()
+        putCached(LAYOUT_FILE_CACHE, path, cached, LAYOUT_FILE_CACHE_SIZE)
+    return list(cached[1])
+
+def buildLayoutIndex(directory = 'layouts'):
+    """
+    Parses every layout file in directory and saves the results to an index
+    there, as JSON, so that later processes can load them with
+    loadLayoutIndex instead of reading and parsing each file.  Returns the
+    number of layouts indexed.
+
+    A layout whose file has changed since the index was built is parsed
+    again, so a stale index is slow rather than wrong.
+    """
+    layouts = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.lay'): continue
+        path = os.path.realpath(os.path.join(directory, name))
+        layout = tryToLoad(path)
+        (size, mtime), layoutText = getCached(LAYOUT_FILE_CACHE, path)
+        layouts[name] = {'size': size, 'mtime': mtime, 'text': list(layoutText),
+                         'width': layout.width, 'height': layout.height,
+                         'walls': layout.walls.bits, 'food': layout.food.bits,
+                         'capsules': layout.capsules, 'agentPositions': layout.agentPositions,
+                         'numGhosts': layout.numGhosts}
+    f = open(os.path.join(directory, LAYOUT_INDEX_NAME), 'w')
+    try: json.dump({'version': LAYOUT_INDEX_VERSION, 'layouts': layouts}, f)
     finally: f.close()
+    return len(layouts)
+
+def loadLayoutIndex(directory = 'layouts'):
+    """
+    Loads the index built by buildLayoutIndex in directory into the layout
+    caches, and returns the number of layouts in it.  The index is only
+    used when this is called, as pacman.py does with --layoutIndex.
+
+    If there is no index, or it cannot be read, nothing is loaded and the
+    layouts are parsed from their files as usual.  Otherwise the layout
+    caches are grown to hold every layout in the index.
+    """
+    global LAYOUT_CACHE_SIZE, LAYOUT_FILE_CACHE_SIZE
+    path = os.path.join(directory, LAYOUT_INDEX_NAME)
+    if not os.path.exists(path): return 0
+    try:
+        f = open(path)
+        try: index = json.load(f)
+        finally: f.close()
+        if index['version'] != LAYOUT_INDEX_VERSION:
+            raise ValueError('version %s is not %s' % (index['version'], LAYOUT_INDEX_VERSION))
+        entries = [(os.path.realpath(os.path.join(directory, name)), readIndexEntry(entry))
+                   for name, entry in index['layouts'].items()]
+    except (IOError, ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        print('Warning: ignoring the layout index %s (%s)' % (path, e), file=sys.stderr)
+        return 0
+    LAYOUT_CACHE_SIZE = max(LAYOUT_CACHE_SIZE, len(entries))
+    LAYOUT_FILE_CACHE_SIZE = max(LAYOUT_FILE_CACHE_SIZE, len(entries))
+    for layoutPath, (fileCacheEntry, layoutCacheEntry) in entries:
+        if getCached(LAYOUT_FILE_CACHE, layoutPath) == None:
+            putCached(LAYOUT_FILE_CACHE, layoutPath, fileCacheEntry, LAYOUT_FILE_CACHE_SIZE)
+        key = '\n'.join(fileCacheEntry[1])
+        if getCached(LAYOUT_CACHE, key) == None:
+            putCached(LAYOUT_CACHE, key, layoutCacheEntry, LAYOUT_CACHE_SIZE)
+    return len(entries)
+
+def readIndexEntry(entry):
+    """
+    Turns a layout of an index back into its LAYOUT_FILE_CACHE and
+    LAYOUT_CACHE entries.
+    """
+    layoutText = tuple([str(line) for line in entry['text']])
+    width, height = len(layoutText[0]), len(layoutText)
+    if (entry['width'], entry['height']) != (width, height):
+        raise ValueError('the grids are not the size of the layout')
+    grids = []
+    for bits in [entry['walls'], entry['food']]:
+        if not (type(bits) == int and 0 <= bits < 1 << (width * height)):
+            raise ValueError('the grids do not fit the layout')
+        grids.append(BitGrid.fromBits(width, height, bits))
+    walls, food = grids
+    capsules = tuple([(x, y) for x, y in entry['capsules']])
+    agentPositions = tuple([(bool(isPacman), (x, y)) for isPacman, (x, y) in entry['agentPositions']])
+    signature = (int(entry['size']), int(entry['mtime']))
+    return (signature, layoutText), (walls, food, capsules, agentPositions, int(entry['numGhosts']))
+
+if __name__ == '__main__':
+    for directory in sys.argv[1:] or ['layouts']:
+        print('Indexed %d layouts in %s' % (buildLayoutIndex(directory), directory))
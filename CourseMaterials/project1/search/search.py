@@ -17,6 +17,8 @@ In search.py, you will implement generic search algorithms which are called by
 Pacman agents (in searchAgents.py).
 """
 
+import time
+from collections import deque
 import util
 
 
@@ -62,11 +64,259 @@ class SearchProblem:
         """
         util.raiseNotDefined()
 
+    # Problems with a single goal state can also offer getGoalState, returning
+    # that state, and getPredecessors, which for a given state returns the
+    # triples (predecessor, action, stepCost) where 'action' leads from
+    # 'predecessor' to the state.  The bidirectional searches need both.
 
-class SearchNode:
-    def __init__(self, state, moveSequence) -> None:
-        self.state = state
-        self.moveSequence = moveSequence
+
+class SearchStatistics:
+    """
+    Records what searches do, to compare searches and heuristics.  Give a
+    problem one as problem.statistics before searching it, and the searches
+    below add to its counts:
+
+      searches        the number of searches run
+      expanded        states whose successors (or predecessors) were generated
+      generated       successors (or predecessors) generated
+      duplicates      successors dropped because their state was closed or
+                      already reached at no greater cost
+      maxFrontier     the most nodes open at once (for IDA*, the longest path)
+      heuristicCalls  evaluations of the heuristic
+      heuristicTime   seconds spent in the heuristic
+      successorTime   seconds spent generating successors and predecessors
+      searchTime      seconds spent searching in all
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.maxFrontier = 0
+        self.heuristicCalls = 0
+        self.heuristicTime = 0.0
+        self.successorTime = 0.0
+        self.searchTime = 0.0
+        # When the current search began; see beginSearch
+        self.startTime = None
+
+    def timeSuccessors(self, getSuccessors):
+        """
+        Returns getSuccessors (or getPredecessors), counting and timing each
+        call.
+        """
+        def timedSuccessors(state):
+            start = time.perf_counter()
+            successors = getSuccessors(state)
+            self.successorTime += time.perf_counter() - start
+            self.expanded += 1
+            self.generated += len(successors)
+            return successors
+        return timedSuccessors
+
+    def timeHeuristic(self, heuristic):
+        """
+        Returns heuristic, counting and timing each call.
+        """
+        def timedHeuristic(state, problem=None):
+            start = time.perf_counter()
+            value = heuristic(state, problem)
+            self.heuristicTime += time.perf_counter() - start
+            self.heuristicCalls += 1
+            return value
+        return timedHeuristic
+
+    def getSummary(self):
+        """
+        Returns the statistics as a dict.
+        """
+        return dict([(name, getattr(self, name)) for name in
+                     ['searches', 'expanded', 'generated', 'duplicates', 'maxFrontier', 'heuristicCalls',
+                      'heuristicTime', 'successorTime', 'searchTime']])
+
+    def __str__(self):
+        return ('generated %d, duplicates %d, max frontier %d, heuristic calls %d (%.3fs), '
+                'successors %.3fs, search %.3fs' % (self.generated, self.duplicates, self.maxFrontier,
+                                                     self.heuristicCalls, self.heuristicTime,
+                                                     self.successorTime, self.searchTime))
+
+
+def beginSearch(problem, heuristic=None):
+    """
+    Starts a search of problem.  Returns the functions the search should call
+    for successors, predecessors (None if problem has no getPredecessors) and
+    the heuristic: timed by problem.statistics if problem has statistics, and
+    the problem's own otherwise.
+    """
+    getSuccessors = problem.getSuccessors
+    getPredecessors = getattr(problem, 'getPredecessors', None)
+    statistics = getattr(problem, 'statistics', None)
+    if statistics == None:
+        return getSuccessors, getPredecessors, heuristic
+    statistics.searches += 1
+    statistics.startTime = time.perf_counter()
+    getSuccessors = statistics.timeSuccessors(getSuccessors)
+    if getPredecessors != None:
+        getPredecessors = statistics.timeSuccessors(getPredecessors)
+    if heuristic != None:
+        heuristic = statistics.timeHeuristic(heuristic)
+    return getSuccessors, getPredecessors, heuristic
+
+
+def endSearch(problem, path, maxFrontier, duplicates):
+    """
+    Ends a search of problem that found path, recording the largest frontier
+    and the duplicates it saw in problem.statistics.  Returns path.
+    """
+    statistics = getattr(problem, 'statistics', None)
+    if statistics != None:
+        statistics.searchTime += time.perf_counter() - statistics.startTime
+        statistics.maxFrontier = max(statistics.maxFrontier, maxFrontier)
+        statistics.duplicates += duplicates
+    return path
+
+
+# The number of expanded states an ExpansionTrace keeps
+EXPANSION_TRACE_SIZE = 100000
+
+
+class ExpansionTrace:
+    """
+    The states a search expanded, in the order they were first expanded, for
+    the display to draw.  Only the last maxSize of them are kept, and only
+    those are checked for repeats, so memory stays bounded however long the
+    search runs.
+    """
+
+    def __init__(self, maxSize=EXPANSION_TRACE_SIZE):
+        self.maxSize = maxSize
+        self.states = deque()
+        # State -> the number of times it is in self.states
+        self.counts = {}
+
+    def add(self, state):
+        "Records that state was expanded, unless it is already in the trace"
+        if state not in self.counts:
+            self.append(state)
+
+    def append(self, state):
+        "Records state even if it is already in the trace"
+        if len(self.states) >= self.maxSize:
+            oldest = self.states.popleft()
+            self.counts[oldest] -= 1
+            if self.counts[oldest] == 0:
+                del self.counts[oldest]
+        self.states.append(state)
+        self.counts[state] = self.counts.get(state, 0) + 1
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __len__(self):
+        return len(self.states)
+
+
+# Frontier orders for graphSearch
+STACK, QUEUE, PRIORITY = 'stack', 'queue', 'priority'
+
+
+def graphSearch(problem, order, heuristic=None):
+    """
+    The graph search shared by the algorithms below.  order is STACK for
+    depth first, QUEUE for breadth first or PRIORITY for least cost (plus
+    heuristic, if given) first; ties in a PRIORITY frontier go to the node
+    pushed first.
+
+    The goal test is made when a node is popped, and a node whose state is
+    already closed is skipped, so states are expanded in the same order as
+    with a frontier holding every child.  Nodes are indices into parallel
+    lists of states, parents, actions and path costs, so a child costs a few
+    appends rather than a copy of its parent's path; the path is rebuilt from
+    the parent pointers once a goal is popped.  States must be hashable.
+    If problem has statistics, the search is recorded in them.
+
+    For QUEUE and PRIORITY frontiers, a child is not pushed unless it is
+    cheaper than the best path to its state pushed so far: the earlier node
+    would always be popped first, so the later one could only be skipped.
+    A PRIORITY frontier is an IndexedPriorityQueue of states, in which a
+    cheaper path to a state replaces the one already there, as if it had
+    been pushed alongside it.
+    """
+    getSuccessors, _, heuristic = beginSearch(problem, heuristic)
+    startState = problem.getStartState()
+    states, parents, actions, costs = [startState], [-1], [None], [0]
+    closed = set()
+    bestCost = {startState: 0}
+
+    def priority(node):
+        if heuristic == None:
+            return costs[node]
+        return costs[node] + heuristic(states[node], problem)
+
+    if order == STACK:
+        frontier = [0]
+        pop = frontier.pop
+    elif order == QUEUE:
+        frontier = deque([0])
+        pop = frontier.popleft
+    elif order == PRIORITY:
+        frontier = util.IndexedPriorityQueue()
+        frontier.push(startState, priority(0))
+        openNodes = {startState: 0}     # state -> its node in the frontier
+
+        def pop():
+            return openNodes.pop(frontier.pop())
+    else:
+        raise ValueError('Unknown frontier order: %s' % order)
+
+    peak, duplicates = 1, 0
+    while frontier:
+        node = pop()
+        state = states[node]
+        if problem.isGoalState(state):
+            return endSearch(problem, getPath(node, parents, actions), peak, duplicates)
+        if state in closed:
+            continue
+        closed.add(state)
+
+        cost = costs[node]
+        for childState, action, stepCost in getSuccessors(state):
+            if childState in closed:
+                duplicates += 1
+                continue
+            childCost = cost + stepCost
+            if order != STACK:
+                if childState in bestCost and bestCost[childState] <= childCost:
+                    duplicates += 1
+                    continue
+                bestCost[childState] = childCost
+            child = len(states)
+            states.append(childState)
+            parents.append(node)
+            actions.append(action)
+            costs.append(childCost)
+            if order == PRIORITY:
+                openNodes[childState] = child
+                frontier.push(childState, priority(child))
+            else:
+                frontier.append(child)
+        if len(frontier) > peak:
+            peak = len(frontier)
+
+    return endSearch(problem, [], peak, duplicates)
+
+
+def getPath(node, parents, actions):
+    """
+    Returns the actions from the start to node, following parent pointers.
+    """
+    path = []
+    while parents[node] != -1:
+        path.append(actions[node])
+        node = parents[node]
+    path.reverse()
+    return path
 
 
 def tinyMazeSearch(problem):
@@ -95,87 +345,19 @@ def depthFirstSearch(problem: SearchProblem):
     print("Start's successors:", problem.getSuccessors(problem.getStartState()))
     """
     "*** YOUR CODE HERE ***"
-    from util import Stack
-    vistedStates = []
-    frontier = Stack()
-    frontier.push(SearchNode(problem.getStartState(), []))
-
-    while not frontier.isEmpty():
-        node = frontier.pop()
-        if problem.isGoalState(node.state):
-            return node.moveSequence
-        if node.state in vistedStates:
-            continue
-        vistedStates.append(node.state)
-
-        for childState, action, stepCost in problem.getSuccessors(node.state):
-            if childState in vistedStates:
-                continue
-            childMoveSequence = node.moveSequence[:]
-            childMoveSequence.append(action)
-            childNode = SearchNode(childState, childMoveSequence)
-            frontier.push(childNode)
-
-    return []
+    return graphSearch(problem, STACK)
 
 
 def breadthFirstSearch(problem: SearchProblem):
     """Search the shallowest nodes in the search tree first."""
     "*** YOUR CODE HERE ***"
-    from util import Queue
-    vistedStates = []
-    frontier = Queue()
-    frontier.push(SearchNode(problem.getStartState(), []))
-
-    while not frontier.isEmpty():
-        node = frontier.pop()
-        if problem.isGoalState(node.state):
-            return node.moveSequence
-        if node.state in vistedStates:
-            continue
-        vistedStates.append(node.state)
-
-        for childState, action, stepCost in problem.getSuccessors(node.state):
-            if childState in vistedStates:
-                continue
-            childMoveSequence = node.moveSequence[:]
-            childMoveSequence.append(action)
-            childNode = SearchNode(childState, childMoveSequence)
-            frontier.push(childNode)
-
-    return []
+    return graphSearch(problem, QUEUE)
 
 
 def uniformCostSearch(problem: SearchProblem):
     """Search the node of least total cost first."""
     "*** YOUR CODE HERE ***"
-    from util import PriorityQueue
-    vistedStates = []
-    moveCost = {}
-    frontier = PriorityQueue()
-    initialNode = SearchNode(problem.getStartState(), [])
-    moveCost[initialNode] = 0
-    frontier.push(initialNode, 0)
-
-    while not frontier.isEmpty():
-        node = frontier.pop()
-        if problem.isGoalState(node.state):
-            return node.moveSequence
-        if node.state in vistedStates:
-            continue
-        vistedStates.append(node.state)
-
-        for childState, action, stepCost in problem.getSuccessors(node.state):
-            if childState in vistedStates:
-                continue
-            childMoveSequence = node.moveSequence[:]
-            childMoveSequence.append(action)
-            childCost = moveCost[node] + stepCost
-            childNode = SearchNode(childState, childMoveSequence)
-            moveCost[childNode] = childCost
-            frontier.update(childNode, childCost)
-
-    return []
+    return graphSearch(problem, PRIORITY)
 
 
 def nullHeuristic(state, problem=None):
@@ -186,37 +368,252 @@ def nullHeuristic(state, problem=None):
     return 0
 
 
+# The number of states whose heuristic a MemoizedHeuristic remembers
+MEMOIZED_HEURISTIC_SIZE = 100000
+
+
+class MemoizedHeuristic:
+    """
+    Wraps a heuristic so that each state is evaluated once, for heuristics
+    that cost more than a lookup.  It is called like the heuristic it wraps
+    and can be given to any search in its place.
+
+    The values of the maxSize most recently used states are kept, and
+    forgotten when the wrapper is called with a different problem.  hits and
+    misses count the calls answered from memory and those that were not.
+    """
+
+    def __init__(self, heuristic, maxSize=MEMOIZED_HEURISTIC_SIZE):
+        self.heuristic = heuristic
+        self.values = util.LRUCache(maxSize)
+        self.problem = None
+
+    def __call__(self, state, problem=None):
+        if problem is not self.problem:
+            self.values.clear()
+            self.problem = problem
+        value = self.values.get(state)
+        if value == None:
+            value = self.values[state] = self.heuristic(state, problem)
+        return value
+
+    @property
+    def hits(self):
+        return self.values.hits
+
+    @property
+    def misses(self):
+        return self.values.misses
+
+
 def aStarSearch(problem: SearchProblem, heuristic=nullHeuristic):
     """Search the node that has the lowest combined cost and heuristic first."""
     "*** YOUR CODE HERE ***"
-    from util import PriorityQueueWithFunction
-
-    vistedStates = []
-    moveCost = {}
-    frontier = PriorityQueueWithFunction(
-        lambda node: moveCost[node] + heuristic(node.state, problem))
-    initialNode = SearchNode(problem.getStartState(), [])
-    moveCost[initialNode] = 0
-    frontier.push(initialNode)
-
-    while not frontier.isEmpty():
-        node = frontier.pop()
-        if problem.isGoalState(node.state):
-            return node.moveSequence
-        if node.state in vistedStates:
-            continue
-        vistedStates.append(node.state)
+    return graphSearch(problem, PRIORITY, heuristic)
 
-        for childState, action, stepCost in problem.getSuccessors(node.state):
-            if childState in vistedStates:
-                continue
-            childMoveSequence = node.moveSequence[:]
-            childMoveSequence.append(action)
-            childCost = moveCost[node] + stepCost
-            childNode = SearchNode(childState, childMoveSequence)
-            moveCost[childNode] = childCost
-            frontier.push(childNode)
-    return []
+
+def bidirectionalBreadthFirstSearch(problem: SearchProblem):
+    """
+    Search breadth first from the start and, with getPredecessors, back from
+    the goal, a whole layer at a time on the side with the smaller layer,
+    until the two searches meet.  Returns a path with the fewest actions to
+    problem.getGoalState().
+    """
+    getSuccessors, getPredecessors, _ = beginSearch(problem)
+    startState, goalState = problem.getStartState(), problem.getGoalState()
+    if problem.isGoalState(startState):
+        return endSearch(problem, [], 1, 0)
+    # state -> (neighbor, action, depth): the neighbor one step nearer the
+    # start or goal, the action between the two and the depth of the state
+    forward = {startState: (None, None, 0)}
+    backward = {goalState: (None, None, 0)}
+    forwardLayer, backwardLayer = [startState], [goalState]
+    peak, duplicates = 2, 0
+
+    while forwardLayer and backwardLayer:
+        peak = max(peak, len(forwardLayer) + len(backwardLayer))
+        meeting, meetingLength = None, None
+        nextLayer = []
+        if len(forwardLayer) <= len(backwardLayer):
+            for state in forwardLayer:
+                depth = forward[state][2] + 1
+                for childState, action, stepCost in getSuccessors(state):
+                    if childState in backward:
+                        length = depth + backward[childState][2]
+                        if meeting == None or length < meetingLength:
+                            meeting, meetingLength = (state, action, childState), length
+                    if childState not in forward:
+                        forward[childState] = (state, action, depth)
+                        nextLayer.append(childState)
+                    else:
+                        duplicates += 1
+            forwardLayer = nextLayer
+        else:
+            for state in backwardLayer:
+                depth = backward[state][2] + 1
+                for predecessor, action, stepCost in getPredecessors(state):
+                    if predecessor in forward:
+                        length = depth + forward[predecessor][2]
+                        if meeting == None or length < meetingLength:
+                            meeting, meetingLength = (predecessor, action, state), length
+                    if predecessor not in backward:
+                        backward[predecessor] = (state, action, depth)
+                        nextLayer.append(predecessor)
+                    else:
+                        duplicates += 1
+            backwardLayer = nextLayer
+        if meeting != None:
+            return endSearch(problem, joinPaths(forward, backward, meeting), peak, duplicates)
+
+    return endSearch(problem, [], peak, duplicates)
+
+
+def bidirectionalUniformCostSearch(problem: SearchProblem):
+    """
+    Search the node of least total cost first, both from the start and, with
+    getPredecessors, back from the goal, always on the side whose cheapest
+    open node is cheaper.  Stops once no pair of open nodes could join into a
+    cheaper path than the best found so far.
+    """
+    import heapq
+
+    getSuccessors, getPredecessors, _ = beginSearch(problem)
+    startState, goalState = problem.getStartState(), problem.getGoalState()
+    if problem.isGoalState(startState):
+        return endSearch(problem, [], 1, 0)
+    # As in bidirectionalBreadthFirstSearch, but with path costs in place of
+    # depths; frontiers are heaps of (cost, count, state) that may hold
+    # entries for states since reached more cheaply
+    forward = {startState: (None, None, 0)}
+    backward = {goalState: (None, None, 0)}
+    forwardFrontier, backwardFrontier = [(0, 0, startState)], [(0, 1, goalState)]
+    forwardClosed, backwardClosed = set(), set()
+    count = 2
+    meeting, meetingCost = None, None
+    peak, duplicates = 2, 0
+
+    def top(frontier, labels, closed):
+        # Drops stale entries, then returns the cost of the cheapest open node
+        while frontier and (frontier[0][2] in closed or frontier[0][0] > labels[frontier[0][2]][2]):
+            heapq.heappop(frontier)
+        if frontier:
+            return frontier[0][0]
+        return None
+
+    while True:
+        forwardTop = top(forwardFrontier, forward, forwardClosed)
+        backwardTop = top(backwardFrontier, backward, backwardClosed)
+        if forwardTop == None or backwardTop == None:
+            break
+        if meeting != None and forwardTop + backwardTop >= meetingCost:
+            break
+        peak = max(peak, len(forwardFrontier) + len(backwardFrontier))
+
+        if forwardTop <= backwardTop:
+            cost, _, state = heapq.heappop(forwardFrontier)
+            forwardClosed.add(state)
+            for childState, action, stepCost in getSuccessors(state):
+                childCost = cost + stepCost
+                if childState in backward:
+                    length = childCost + backward[childState][2]
+                    if meeting == None or length < meetingCost:
+                        meeting, meetingCost = (state, action, childState), length
+                if childState not in forwardClosed and (childState not in forward or childCost < forward[childState][2]):
+                    forward[childState] = (state, action, childCost)
+                    heapq.heappush(forwardFrontier, (childCost, count, childState))
+                    count += 1
+                else:
+                    duplicates += 1
+        else:
+            cost, _, state = heapq.heappop(backwardFrontier)
+            backwardClosed.add(state)
+            for predecessor, action, stepCost in getPredecessors(state):
+                predecessorCost = cost + stepCost
+                if predecessor in forward:
+                    length = predecessorCost + forward[predecessor][2]
+                    if meeting == None or length < meetingCost:
+                        meeting, meetingCost = (predecessor, action, state), length
+                if predecessor not in backwardClosed and (predecessor not in backward or predecessorCost < backward[predecessor][2]):
+                    backward[predecessor] = (state, action, predecessorCost)
+                    heapq.heappush(backwardFrontier, (predecessorCost, count, predecessor))
+                    count += 1
+                else:
+                    duplicates += 1
+
+    if meeting == None:
+        return endSearch(problem, [], peak, duplicates)
+    return endSearch(problem, joinPaths(forward, backward, meeting), peak, duplicates)
+
+
+def joinPaths(forward, backward, meeting):
+    """
+    Returns the path through meeting, a (state, action, nextState) triple
+    joining a state labelled by the forward search to one labelled by the
+    backward search.
+    """
+    state, action, nextState = meeting
+    path = []
+    while forward[state][0] != None:
+        state, stateAction, _ = forward[state]
+        path.append(stateAction)
+    path.reverse()
+    path.append(action)
+    while backward[nextState][0] != None:
+        nextState, stateAction, _ = backward[nextState]
+        path.append(stateAction)
+    return path
+
+
+def iterativeDeepeningAStarSearch(problem: SearchProblem, heuristic=nullHeuristic):
+    """
+    Search depth first for a path whose cost plus heuristic stays within a
+    bound, starting from the heuristic of the start and raising the bound to
+    the smallest value that went over it until a goal is found.
+
+    Only the current path is kept, plus a transposition table of the
+    cheapest cost at which each state has been reached in this round; a
+    state reached again at no lower cost is not searched twice.  With a
+    consistent heuristic the path found is optimal.
+    """
+    getSuccessors, _, heuristic = beginSearch(problem, heuristic)
+    startState = problem.getStartState()
+    if problem.isGoalState(startState):
+        return endSearch(problem, [], 1, 0)
+    bound = heuristic(startState, problem)
+    peak, duplicates = 1, 0
+
+    while True:
+        bestCost = {startState: 0}
+        path = []
+        # (state, cost, the successors of state still to try)
+        frames = [(startState, 0, iter(getSuccessors(startState)))]
+        nextBound = None
+        while frames:
+            state, cost, successors = frames[-1]
+            for childState, action, stepCost in successors:
+                childCost = cost + stepCost
+                if childState in bestCost and bestCost[childState] <= childCost:
+                    duplicates += 1
+                    continue
+                bestCost[childState] = childCost
+                estimate = childCost + heuristic(childState, problem)
+                if estimate > bound:
+                    if nextBound == None or estimate < nextBound:
+                        nextBound = estimate
+                    continue
+                path.append(action)
+                if problem.isGoalState(childState):
+                    return endSearch(problem, path, peak, duplicates)
+                frames.append((childState, childCost, iter(getSuccessors(childState))))
+                peak = max(peak, len(frames))
+                break
+            else:
+                frames.pop()
+                if path:
+                    path.pop()
+        if nextBound == None:
+            return endSearch(problem, [], peak, duplicates)
+        bound = nextBound
 
 
 # Abbreviations
@@ -224,3 +621,6 @@ bfs = breadthFirstSearch
 dfs = depthFirstSearch
 astar = aStarSearch
 ucs = uniformCostSearch
+bibfs = bidirectionalBreadthFirstSearch
+biucs = bidirectionalUniformCostSearch
+idastar = iterativeDeepeningAStarSearch
@@ -35,6 +35,8 @@ Good luck and happy searching!
 """
 
 from typing import List, Tuple, Any
+from array import array
+from collections import OrderedDict, deque
 from game import Directions
 from game import Agent
 from game import Actions
@@ -43,6 +45,11 @@ import time
 import search
 import pacman
 
+try:
+    import numpy
+except ImportError:  # MazeDistances falls back to an array of shorts
+    numpy = None
+
 
 class GoWestAgent(Agent):
     "An agent that goes West until it can't."
@@ -72,6 +79,9 @@ class SearchAgent(Agent):
     Options for fn include:
       depthFirstSearch or dfs
       breadthFirstSearch or bfs
+      bidirectionalBreadthFirstSearch or bibfs
+      bidirectionalUniformCostSearch or biucs
+      iterativeDeepeningAStarSearch or idastar
 
 
     Note: You should NOT change any code in SearchAgent
@@ -121,6 +131,8 @@ class SearchAgent(Agent):
             raise Exception("No search function provided for SearchAgent")
         starttime = time.time()
         problem = self.searchType(state)  # Makes a new search problem
+        # What the search did, kept for whoever wants more than the printout
+        problem.statistics = self.statistics = search.SearchStatistics()
         self.actions = self.searchFunction(problem)  # Find a path
         if self.actions == None:
             self.actions = []
@@ -129,6 +141,8 @@ class SearchAgent(Agent):
               (totalCost, time.time() - starttime))
         if '_expanded' in dir(problem):
             print('Search nodes expanded: %d' % problem._expanded)
+        if self.statistics.searches > 0:
+            print('Search statistics: %s' % self.statistics)
 
     def getAction(self, state):
         """
@@ -177,8 +191,9 @@ class PositionSearchProblem(search.SearchProblem):
         if warn and (gameState.getNumFood() != 1 or not gameState.hasFood(*goal)):
             print('Warning: this does not look like a regular search maze')
 
-        # For display purposes
-        self._visited, self._visitedlist, self._expanded = {}, [], 0  # DO NOT CHANGE
+        # For display purposes; the expanded states are only traced when they
+        # will be drawn
+        self._visitedlist, self._expanded = search.ExpansionTrace(), 0  # DO NOT CHANGE
 
     def getStartState(self):
         return self.startState
@@ -222,12 +237,37 @@ class PositionSearchProblem(search.SearchProblem):
 
         # Bookkeeping for display purposes
         self._expanded += 1  # DO NOT CHANGE
-        if state not in self._visited:
-            self._visited[state] = True
-            self._visitedlist.append(state)
+        if self.visualize:
+            self._visitedlist.add(state)
 
         return successors
 
+    def getGoalState(self):
+        return self.goal
+
+    def getPredecessors(self, state):
+        """
+        Returns the triples (predecessor, action, stepCost) where 'action'
+        leads from 'predecessor' to state, for the bidirectional searches in
+        search.py.  Moves can always be undone, so the predecessors are the
+        neighbors of state, and the cost of each step is that of state.
+        """
+        predecessors = []
+        cost = self.costFn(state)
+        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+            x, y = state
+            dx, dy = Actions.directionToVector(action)
+            previousx, previousy = int(x - dx), int(y - dy)
+            if not self.walls[previousx][previousy]:
+                predecessors.append(((previousx, previousy), action, cost))
+
+        # Bookkeeping for display purposes
+        self._expanded += 1
+        if self.visualize:
+            self._visitedlist.add(state)
+
+        return predecessors
+
     def getCostOfActions(self, actions):
         """
         Returns the cost of a particular sequence of actions. If those actions
@@ -310,13 +350,19 @@ class CornersProblem(search.SearchProblem):
         self.startingPosition = startingGameState.getPacmanPosition()
         top, right = self.walls.height-2, self.walls.width-2
         self.corners = ((1, 1), (1, top), (right, 1), (right, top))
-        self.expandedCorners = []
-        if self.startingPosition in self.corners:
-            self.expandedCorners.append(self.startingPosition)
+        # A state is ( pacmanPosition, visitedCorners ), where bit i of the
+        # int visitedCorners is set once self.corners[i] has been visited
+        self.cornerBits = {}
+        for i, corner in enumerate(self.corners):
+            self.cornerBits[corner] = self.cornerBits.get(corner, 0) | (1 << i)
+        self.allCorners = (1 << len(self.corners)) - 1
+        self.expandedCorners = self.cornerBits.get(self.startingPosition, 0)
+        self.moves = {}  # position -> [(nextPosition, action)]
         for corner in self.corners:
             if not startingGameState.hasFood(*corner):
                 print('Warning: no food in corner ' + str(corner))
         self._expanded = 0  # DO NOT CHANGE; Number of search nodes expanded
+        self.heuristicInfo = {}  # A dictionary for the heuristic to store information
 
     def getStartState(self):
         """
@@ -331,7 +377,7 @@ class CornersProblem(search.SearchProblem):
         Returns whether this search state is a goal state of the problem.
         """
         "*** YOUR CODE HERE ***"
-        return len(state[1]) == 4
+        return state[1] == self.allCorners
 
     def getSuccessors(self, state: Any):
         """
@@ -344,29 +390,29 @@ class CornersProblem(search.SearchProblem):
             is the incremental cost of expanding to that successor
         """
 
-        successors = []
-        for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
-            # Add a successor state to the successor list if the action is legal
-            # Here's a code snippet for figuring out whether a new position hits a wall:
-            #   x,y = currentPosition
-            #   dx, dy = Actions.directionToVector(action)
-            #   nextx, nexty = int(x + dx), int(y + dy)
-            #   hitsWall = self.walls[nextx][nexty]
-
-            "*** YOUR CODE HERE ***"
-            x, y = state[0]
-            dx, dy = Actions.directionToVector(action)
-            nextX, nextY = int(x + dx), int(y + dy)
-            if not self.walls[nextX][nextY]:
-                # copy the original state rather than refer to it
-                successorExpandedCorners = state[1][:]
-                if (nextX, nextY) in self.corners and (nextX, nextY) not in state[1]:
-                    successorExpandedCorners.append((nextX, nextY))
-                successor = ((nextX, nextY), successorExpandedCorners)
-                successors.append((successor, action, 1))
+        position, visitedCorners = state
+        moves = self.moves.get(position)
+        if moves == None:
+            moves = self.moves[position] = []
+            for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                # Add a successor state to the successor list if the action is legal
+                # Here's a code snippet for figuring out whether a new position hits a wall:
+                #   x,y = currentPosition
+                #   dx, dy = Actions.directionToVector(action)
+                #   nextx, nexty = int(x + dx), int(y + dy)
+                #   hitsWall = self.walls[nextx][nexty]
+
+                "*** YOUR CODE HERE ***"
+                x, y = position
+                dx, dy = Actions.directionToVector(action)
+                nextX, nextY = int(x + dx), int(y + dy)
+                if not self.walls[nextX][nextY]:
+                    moves.append(((nextX, nextY), action))
 
         self._expanded += 1  # DO NOT CHANGE
-        return successors
+        cornerBits = self.cornerBits
+        return [((nextPosition, visitedCorners | cornerBits.get(nextPosition, 0)), action, 1)
+                for nextPosition, action in moves]
 
     def getCostOfActions(self, actions):
         """
@@ -402,18 +448,32 @@ def cornersHeuristic(state: Any, problem: CornersProblem):
     walls = problem.walls
 
     "*** YOUR CODE HERE ***"
-    from util import PriorityQueue
-    from util import manhattanDistance
-    
-    distanceList = []
-    visitedCorners = state[1]
-    for corner in corners:
-        if corner not in visitedCorners:
-            distanceList.append(mazeDistance(state[0], corner, problem.gameState))
-
-    if (len(distanceList) == 0):
-        return 0;
-    return max(distanceList)
+    position, visitedCorners = state
+    remaining = problem.allCorners & ~visitedCorners
+    if remaining == 0:
+        return 0
+
+    # The length of the shortest walk from position through every remaining
+    # corner: the distance to the corner visited first, plus the shortest
+    # tour from there through the rest.  This is the exact cost left, so it
+    # is admissible and consistent.
+    cornerFields = problem.heuristicInfo.get('cornerFields')
+    if cornerFields == None:
+        cornerFields = problem.heuristicInfo['cornerFields'] = [
+            distanceField(walls, corner) for corner in corners]
+        problem.heuristicInfo['cornerTours'] = cornerTourCosts(
+            [[field.get(corner, UNREACHABLE) for corner in corners] for field in cornerFields])
+    cornerTours = problem.heuristicInfo['cornerTours']
+
+    best = None
+    for i in range(len(corners)):
+        if remaining & (1 << i) and position in cornerFields[i]:
+            cost = cornerFields[i][position] + cornerTours[i][remaining & ~(1 << i)]
+            if best == None or cost < best:
+                best = cost
+    if best == None:
+        return 0
+    return best
 
     # if (len(state[1]) == 4):
     #     return 0
@@ -455,6 +515,26 @@ def cornersHeuristic(state: Any, problem: CornersProblem):
 
 
 
+def cornerTourCosts(matrix):
+    """
+    Given the distances between n corners as a matrix, returns a table whose
+    [i][mask] entry is the length of the shortest walk from corner i through
+    every corner whose bit is set in mask.
+    """
+    numCorners = len(matrix)
+    tours = [[0] * (1 << numCorners) for i in range(numCorners)]
+    for mask in range(1, 1 << numCorners):
+        for i in range(numCorners):
+            best = None
+            for j in range(numCorners):
+                if mask & (1 << j):
+                    cost = matrix[i][j] + tours[j][mask & ~(1 << j)]
+                    if best == None or cost < best:
+                        best = cost
+            tours[i][mask] = best
+    return tours
+
+
 class AStarCornersAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
 
@@ -517,13 +597,61 @@ class FoodSearchProblem:
         return cost
 
 
+class CompactFoodSearchProblem(FoodSearchProblem):
+    """
+    The FoodSearchProblem with a smaller encoding of its states.
+
+    A search state is a tuple ( pacmanPosition, foodMask ) where foodMask is
+    an int with bit i set while self.foodCells[i], one of the cells with food
+    at the start, still has food.  Unlike a foodGrid, a foodMask takes no
+    time to copy or hash, and the goal test is foodMask == 0.  getFoodList
+    turns a foodMask back into a list of food coordinates.
+    """
+
+    def __init__(self, startingGameState: pacman.GameState):
+        FoodSearchProblem.__init__(self, startingGameState)
+        self.foodCells = self.start[1].asList()
+        self.foodBits = dict([(cell, 1 << i) for i, cell in enumerate(self.foodCells)])
+        self.start = (self.start[0], (1 << len(self.foodCells)) - 1)
+        self.moves = {}  # position -> [(nextPosition, direction)]
+
+    def isGoalState(self, state):
+        return state[1] == 0
+
+    def getSuccessors(self, state):
+        "Returns successor states, the actions they require, and a cost of 1."
+        self._expanded += 1  # DO NOT CHANGE
+        position, foodMask = state
+        moves = self.moves.get(position)
+        if moves == None:
+            moves = self.moves[position] = []
+            x, y = position
+            for direction in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                dx, dy = Actions.directionToVector(direction)
+                nextx, nexty = int(x + dx), int(y + dy)
+                if not self.walls[nextx][nexty]:
+                    moves.append(((nextx, nexty), direction))
+        foodBits = self.foodBits
+        return [((nextPosition, foodMask & ~foodBits.get(nextPosition, 0)), direction, 1)
+                for nextPosition, direction in moves]
+
+    def getFoodList(self, foodMask):
+        "Returns the coordinates of the food left in foodMask"
+        foodList = []
+        while foodMask:
+            lowest = foodMask & -foodMask
+            foodList.append(self.foodCells[lowest.bit_length() - 1])
+            foodMask ^= lowest
+        return foodList
+
+
 class AStarFoodSearchAgent(SearchAgent):
     "A SearchAgent for FoodSearchProblem using A* and your foodHeuristic"
 
     def __init__(self):
         self.searchFunction = lambda prob: search.aStarSearch(
-            prob, foodHeuristic)
-        self.searchType = FoodSearchProblem
+            prob, search.MemoizedHeuristic(foodHeuristic))
+        self.searchType = CompactFoodSearchProblem
 
 
 def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
@@ -541,7 +669,8 @@ def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
 
     The state is a tuple ( pacmanPosition, foodGrid ) where foodGrid is a Grid
     (see game.py) of either True or False. You can call foodGrid.asList() to get
-    a list of food coordinates instead.
+    a list of food coordinates instead.  For a CompactFoodSearchProblem, the
+    foodGrid is an int mask that problem.getFoodList turns into that list.
 
     If you want access to info like walls, capsules, etc., you can query the
     problem.  For example, problem.walls gives you a Grid of where the walls
@@ -556,13 +685,56 @@ def foodHeuristic(state: Tuple[Tuple, List[List]], problem: FoodSearchProblem):
     """
     position, foodGrid = state
     "*** YOUR CODE HERE ***"
-    distanceList = []
-    for grid in foodGrid.asList():
-        distanceList.append(mazeDistance(position, grid, problem.startingGameState))
-
-    if (len(distanceList) == 0):
-        return 0 
-    return max(distanceList)
+    distances = problem.heuristicInfo.get('mazeDistances')
+    if distances == None:
+        distances = problem.heuristicInfo['mazeDistances'] = getMazeDistances(problem.walls)
+
+    if isinstance(foodGrid, int):
+        foodList = problem.getFoodList(foodGrid)
+    else:
+        foodList = foodGrid.asList()
+    if len(foodList) == 0:
+        return 0
+
+    # Pacman has to reach some food, and then walk a path through all of it,
+    # which is no shorter than a minimum spanning tree of the food.  The
+    # tree only changes when food is eaten, so its cost is kept for each set
+    # of remaining food.
+    treeCosts = problem.heuristicInfo.get('treeCosts')
+    if treeCosts == None:
+        treeCosts = problem.heuristicInfo['treeCosts'] = util.LRUCache(FOOD_TREE_CACHE_SIZE)
+    treeCost = treeCosts.get(foodGrid)
+    if treeCost == None:
+        treeCost = treeCosts[foodGrid] = spanningTreeCost(distances.getMatrix(foodList))
+    return min(distances.getDistances(position, foodList)) + treeCost
+
+
+# The number of food sets whose spanning tree cost foodHeuristic remembers
+FOOD_TREE_CACHE_SIZE = 100000
+
+
+def spanningTreeCost(matrix):
+    """
+    Returns the cost of a minimum spanning tree of the complete graph whose
+    edge costs are the given matrix of distances, using Prim's algorithm.
+    """
+    numNodes = len(matrix)
+    linkCosts = list(matrix[0])
+    inTree = [False] * numNodes
+    inTree[0] = True
+    cost = 0
+    for i in range(numNodes - 1):
+        nearest, nearestCost = -1, None
+        for node in range(numNodes):
+            if not inTree[node] and (nearest == -1 or linkCosts[node] < nearestCost):
+                nearest, nearestCost = node, linkCosts[node]
+        inTree[nearest] = True
+        cost += nearestCost
+        row = matrix[nearest]
+        for node in range(numNodes):
+            if row[node] < linkCosts[node]:
+                linkCosts[node] = row[node]
+    return cost
 
 
 
@@ -570,22 +742,74 @@ class ClosestDotSearchAgent(SearchAgent):
     "Search for all food using a sequence of searches"
 
     def registerInitialState(self, state):
-        self.actions = []
-        currentState = state
-        while (currentState.getFood().count() > 0):
-            nextPathSegment = self.findPathToClosestDot(
-                currentState)  # The missing piece
-            self.actions += nextPathSegment
-            for action in nextPathSegment:
-                legal = currentState.getLegalActions()
-                if action not in legal:
-                    t = (str(action), str(currentState))
-                    raise Exception(
-                        'findPathToClosestDot returned an illegal move: %s!\n%s' % t)
-                currentState = currentState.generateSuccessor(0, action)
+        self.actions = self.planClosestDots(state)
         self.actionIndex = 0
         print('Path found with cost %d.' % len(self.actions))
 
+    def planClosestDots(self, state: pacman.GameState):
+        """
+        Returns the actions that eat all the food by always heading for the
+        closest dot, as following findPathToClosestDot from each state
+        would.
+
+        Rather than building a search problem and replaying each path
+        through generateSuccessor, Pacman's position and the food left are
+        followed directly, and the legal moves from each cell are found once
+        for the whole plan.  Each segment is still a fresh breadth first
+        search from Pacman's new position, stopping at the closest dot;
+        nothing of the previous search is reused, so sparse food can cost a
+        search of most of the maze per dot.  If some food cannot be reached,
+        the plan stops short of it.
+        """
+        walls = state.getWalls()
+        food = set(state.getFood().asList())
+        position = state.getPacmanPosition()
+        moves = {}  # position -> [(nextPosition, action)], in getSuccessors order
+        actions = []
+        while food:
+            path = self.findPathToNearest(position, food, walls, moves)
+            if path == None:
+                break
+            for nextPosition, action in path:
+                actions.append(action)
+                food.discard(nextPosition)
+            position = path[-1][0]
+        return actions
+
+    def findPathToNearest(self, start, targets, walls, moves):
+        """
+        Returns the (position, action) steps of a shortest path from start to
+        the nearest of targets, breaking ties as search.bfs does on an
+        AnyFoodSearchProblem; None if no target can be reached.  moves caches
+        the legal moves from each position between calls.
+        """
+        parents = {start: None}
+        frontier = deque([start])
+        while frontier:
+            position = frontier.popleft()
+            if position in targets:
+                path = []
+                while parents[position] != None:
+                    parent, action = parents[position]
+                    path.append((position, action))
+                    position = parent
+                path.reverse()
+                return path
+            nextMoves = moves.get(position)
+            if nextMoves == None:
+                nextMoves = moves[position] = []
+                x, y = position
+                for action in [Directions.NORTH, Directions.SOUTH, Directions.EAST, Directions.WEST]:
+                    dx, dy = Actions.directionToVector(action)
+                    nextx, nexty = int(x + dx), int(y + dy)
+                    if not walls[nextx][nexty]:
+                        nextMoves.append(((nextx, nexty), action))
+            for nextPosition, action in nextMoves:
+                if nextPosition not in parents:
+                    parents[nextPosition] = (position, action)
+                    frontier.append(nextPosition)
+        return None
+
     def findPathToClosestDot(self, gameState: pacman.GameState):
         """
         Returns a path (a list of actions) to the closest dot, starting from
@@ -625,7 +849,8 @@ class AnyFoodSearchProblem(PositionSearchProblem):
         self.walls = gameState.getWalls()
         self.startState = gameState.getPacmanPosition()
         self.costFn = lambda x: 1
-        self._visited, self._visitedlist, self._expanded = {}, [], 0  # DO NOT CHANGE
+        self.visualize = False
+        self._visitedlist, self._expanded = search.ExpansionTrace(), 0  # DO NOT CHANGE
 
     def isGoalState(self, state: Tuple[int, int]):
         """
@@ -647,12 +872,208 @@ def mazeDistance(point1: Tuple[int, int], point2: Tuple[int, int], gameState: pa
     Example usage: mazeDistance( (2,4), (5,6), gameState)
 
     This might be a useful helper function for your ApproximateSearchAgent.
+
+    The distances come from the MazeDistances of the layout's walls, so only
+    the first call for a layout searches.  Points with no path between them
+    are 0 apart, as they were when this ran a breadth first search.
     """
     x1, y1 = point1
     x2, y2 = point2
     walls = gameState.getWalls()
     assert not walls[x1][y1], 'point1 is a wall: ' + str(point1)
     assert not walls[x2][y2], 'point2 is a wall: ' + str(point2)
-    prob = PositionSearchProblem(
-        gameState, start=point1, goal=point2, warn=False, visualize=False)
-    return len(search.bfs(prob))
+    distance = getMazeDistances(walls).getDistance(point1, point2)
+    if distance == None:
+        return 0
+    return distance
+
+
+# The value MazeDistances stores for cells with no path between them
+UNREACHABLE = 0xffff
+
+# The MazeDistances and neighbor tables of recently used walls, least
+# recently used first
+MAZE_DISTANCES_CACHE = OrderedDict()
+MAZE_DISTANCES_CACHE_SIZE = 8
+NEIGHBOR_TABLE_CACHE = OrderedDict()
+NEIGHBOR_TABLE_CACHE_SIZE = 8
+
+
+def getCachedForWalls(cache, cacheSize, walls, build):
+    """
+    Returns cache's value for walls, calling build(walls) to make it only the
+    first time these walls are seen.
+    """
+    if hasattr(walls, 'bits'):
+        key = (walls.width, walls.height, walls.bits)
+    else:
+        key = (walls.width, walls.height, tuple(walls.packBits()))
+    value = cache.get(key)
+    if value == None:
+        value = cache[key] = build(walls)
+        while len(cache) > cacheSize:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return value
+
+
+def getMazeDistances(walls) -> 'MazeDistances':
+    """
+    Returns the MazeDistances for walls, computing them only the first time
+    these walls are seen.
+    """
+    return getCachedForWalls(MAZE_DISTANCES_CACHE, MAZE_DISTANCES_CACHE_SIZE, walls, MazeDistances)
+
+
+def makeNeighborTable(walls):
+    """
+    Returns a dict from each open cell of walls to a tuple of the open cells
+    next to it, in the form of Layout.legalNeighbors.
+    """
+    table = {}
+    for x in range(walls.width):
+        for y in range(walls.height):
+            if not walls[x][y]:
+                table[(x, y)] = tuple(Actions.getLegalNeighbors((x, y), walls))
+    return table
+
+
+def getNeighborTable(walls):
+    """
+    Returns the neighbor table for walls, to give Actions.getLegalNeighbors,
+    building it only the first time these walls are seen.
+    """
+    return getCachedForWalls(NEIGHBOR_TABLE_CACHE, NEIGHBOR_TABLE_CACHE_SIZE, walls, makeNeighborTable)
+
+
+def distanceField(walls, source):
+    """
+    Returns a dict from each open cell that can be reached from source to its
+    maze distance from source, found with a single breadth first search.  Use
+    this rather than getMazeDistances when only the distances from a few
+    cells are needed.
+    """
+    legalNeighbors = getNeighborTable(walls)
+    field = {source: 0}
+    frontier = deque([source])
+    while frontier:
+        cell = frontier.popleft()
+        distance = field[cell] + 1
+        for neighbor in Actions.getLegalNeighbors(cell, walls, legalNeighbors):
+            if neighbor not in field:
+                field[neighbor] = distance
+                frontier.append(neighbor)
+    return field
+
+
+class MazeDistances:
+    """
+    The maze distance between every pair of open cells of a layout, found
+    with a breadth first search from each cell.
+
+    Open cells are numbered in column order and the distances kept in an
+    n-by-n matrix of 16-bit ints indexed by cell number: a NumPy uint16
+    array, or a flat array('H') where NumPy is not installed.  Cells with no
+    path between them are UNREACHABLE apart.
+
+    Use getMazeDistances rather than building one of these, so that the
+    distances of a layout are shared by every problem and heuristic on it.
+    """
+
+    def __init__(self, walls):
+        self.width, self.height = walls.width, walls.height
+        self.cells = [(x, y) for x in range(walls.width)
+                      for y in range(walls.height) if not walls[x][y]]
+        self.cellIds = dict([(cell, i) for i, cell in enumerate(self.cells)])
+        numCells = len(self.cells)
+        legalNeighbors = getNeighborTable(walls)
+        neighbors = []
+        for cell in self.cells:
+            neighbors.append([self.cellIds[neighbor] for neighbor in legalNeighbors[cell]
+                              if neighbor != cell])
+
+        self.useNumpy = numpy != None
+        if self.useNumpy:
+            self.matrix = numpy.full((numCells, numCells), UNREACHABLE, dtype=numpy.uint16)
+        else:
+            self.matrix = array('H', [UNREACHABLE]) * (numCells * numCells)
+        for source in range(numCells):
+            row = [UNREACHABLE] * numCells
+            row[source] = 0
+            frontier = deque([source])
+            while frontier:
+                cell = frontier.popleft()
+                distance = row[cell] + 1
+                for neighbor in neighbors[cell]:
+                    if row[neighbor] == UNREACHABLE:
+                        row[neighbor] = distance
+                        frontier.append(neighbor)
+            if self.useNumpy:
+                self.matrix[source] = row
+            else:
+                self.matrix[source * numCells:(source + 1) * numCells] = array('H', row)
+        self.numCells = numCells
+
+    def getCellId(self, position):
+        """
+        Returns the number of the open cell at position, which indexes the
+        matrix.
+        """
+        return self.cellIds[position]
+
+    def getDistances(self, point, cells):
+        """
+        Returns a list of the maze distances from point to each of cells,
+        UNREACHABLE for those with no path from point.
+        """
+        i = self.cellIds[point]
+        ids = [self.cellIds[cell] for cell in cells]
+        if self.useNumpy:
+            return self.matrix[i, ids].tolist()
+        row = i * self.numCells
+        return [self.matrix[row + j] for j in ids]
+
+    def getMatrix(self, cells):
+        """
+        Returns the maze distances between cells as a list of lists, with
+        the distance from cells[i] to cells[j] at [i][j].
+        """
+        ids = [self.cellIds[cell] for cell in cells]
+        if self.useNumpy:
+            return self.matrix[numpy.ix_(ids, ids)].tolist()
+        return [[self.matrix[i * self.numCells + j] for j in ids] for i in ids]
+
+    def getDistance(self, point1, point2):
+        """
+        Returns the maze distance between two open cells, or None if there
+        is no path between them.
+        """
+        i, j = self.cellIds[point1], self.cellIds[point2]
+        if self.useNumpy:
+            distance = self.matrix.item(i, j)
+        else:
+            distance = self.matrix[i * self.numCells + j]
+        if distance == UNREACHABLE:
+            return None
+        return distance
+
+    def getRow(self, point):
+        """
+        Returns the distances from point to every open cell, indexed by cell
+        number.
+        """
+        i = self.cellIds[point]
+        if self.useNumpy:
+            return self.matrix[i]
+        return self.matrix[i * self.numCells:(i + 1) * self.numCells]
+
+    def distanceField(self, point):
+        """
+        Returns a dict from each open cell that can be reached from point to
+        its maze distance from point.
+        """
+        row = self.getRow(point)
+        if self.useNumpy:
+            row = row.tolist()
+        return dict([(cell, distance) for cell, distance in zip(self.cells, row) if distance != UNREACHABLE])